@@ -4,7 +4,10 @@ import logging
 from traceback import format_exc
 from pyrogram import idle
 from Backend import __version__, db
+from Backend.helper.disk_cache import disk_cache
+from Backend.helper.header_cache import header_cache
 from Backend.helper.pinger import ping
+from Backend.helper.prewarm import prewarm_media_sessions, refresh_media_sessions
 from Backend.logger import LOGGER
 from Backend.fastapi import server
 from Backend.helper.pyro import restart_notification, setup_bot_commands
@@ -19,6 +22,8 @@ async def start_services():
         await asleep(1.2)
         
         await db.connect()
+        await disk_cache.start()
+        await header_cache.start()
         await asleep(1.2)
         
         await StreamBot.start()
@@ -41,7 +46,13 @@ async def start_services():
         LOGGER.info('Initializing Telegram-Stremio Web Server...')
         await restart_notification()
         loop.create_task(server.serve())
+        # Warmed in the background so a slow or unreachable DC cannot hold up the server.
+        LOGGER.info("Pre-warming media sessions...")
+        loop.create_task(prewarm_media_sessions())
         loop.create_task(ping())
+        loop.create_task(refresh_media_sessions())
+        loop.create_task(db.reconcile_counters_periodically())
+        loop.create_task(db.build_search_index())
         
         LOGGER.info("Telegram-Stremio Started Successfully!")
         await idle()
@@ -62,6 +73,7 @@ async def stop_services():
         await Helper.stop()
 
         await db.disconnect()
+        await disk_cache.stop()
         
         LOGGER.info("Services stopped successfully.")
     except Exception:
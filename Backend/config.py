@@ -24,4 +24,29 @@ class Telegram:
 
     ADMIN_USERNAME = getenv("ADMIN_USERNAME", "fyvio")
     ADMIN_PASSWORD = getenv("ADMIN_PASSWORD", "fyvio")
-    
+
+    METRICS_TOKEN = getenv("METRICS_TOKEN", "")
+    TOKEN_SECRET = getenv("TOKEN_SECRET", "")
+
+    STREAM_PREFETCH = int(getenv("STREAM_PREFETCH", "4"))
+    STREAM_STRIPES = int(getenv("STREAM_STRIPES", "1"))
+    STREAM_FAILOVER_RETRIES = int(getenv("STREAM_FAILOVER_RETRIES", "3"))
+    MAX_STREAMS = int(getenv("MAX_STREAMS", "0"))
+    MAX_STREAMS_PER_BOT = int(getenv("MAX_STREAMS_PER_BOT", "0"))
+    STREAM_QUEUE_SIZE = int(getenv("STREAM_QUEUE_SIZE", "32"))
+    STREAM_QUEUE_TIMEOUT = float(getenv("STREAM_QUEUE_TIMEOUT", "5"))
+    STREAM_BANDWIDTH = float(getenv("STREAM_BANDWIDTH", "0"))
+    BINGE_PREFETCH = int(getenv("BINGE_PREFETCH", "8"))
+    STREMIO_PREWARM_RATE = int(getenv("STREMIO_PREWARM_RATE", "30"))
+    STREMIO_PREWARM_CHUNKS = int(getenv("STREMIO_PREWARM_CHUNKS", "1"))
+    CHUNK_CACHE_SIZE = int(getenv("CHUNK_CACHE_SIZE", "128"))
+    DISK_CACHE_DIR = getenv("DISK_CACHE_DIR", "")
+    DISK_CACHE_SIZE = int(getenv("DISK_CACHE_SIZE", "10240"))
+    FILE_INFO_CACHE_SIZE = int(getenv("FILE_INFO_CACHE_SIZE", "10000"))
+    FILE_ID_CACHE_TTL = int(getenv("FILE_ID_CACHE_TTL", "3600"))
+    COUNTER_RECONCILE_INTERVAL = int(getenv("COUNTER_RECONCILE_INTERVAL", "3600"))
+    MEDIA_SESSIONS_PER_DC = int(getenv("MEDIA_SESSIONS_PER_DC", "2"))
+    STREAM_FIRST_CHUNK = int(getenv("STREAM_FIRST_CHUNK", "64"))
+    STREAM_READAHEAD = int(getenv("STREAM_READAHEAD", "4"))
+    HEADER_CACHE_DIR = getenv("HEADER_CACHE_DIR", "")
+    HEADER_CACHE_SIZE = int(getenv("HEADER_CACHE_SIZE", "2048"))
@@ -1,11 +1,15 @@
 from fastapi import FastAPI, Request, Form, Depends, Query
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
+from hmac import compare_digest
+from time import perf_counter
 from Backend import __version__
+from Backend.config import Telegram
+from Backend.helper import metrics
 
-from Backend.fastapi.security.credentials import require_auth
+from Backend.fastapi.security.credentials import is_authenticated, require_auth
 from Backend.fastapi.routes.stream_routes import router as stream_router
 from Backend.fastapi.routes.stremio_routes import router as stremio_router
 from Backend.fastapi.routes.template_routes import (
@@ -39,6 +43,46 @@ try:
 except Exception:
     pass 
 
+class RequestLatencyMiddleware:
+    """Times each request to its response start and to its last body message.
+
+    Plain ASGI, so streamed bodies go straight to the server instead of
+    through the extra memory stream and task of BaseHTTPMiddleware.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = perf_counter()
+        status = []
+
+        def observe(metric, code: int) -> None:
+            # The route template, not the raw path, keeps label cardinality bounded.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metric.observe(perf_counter() - started, route, scope["method"], f"{code // 100}xx")
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+                observe(metrics.http_latency, message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe(metrics.http_duration, status[0] if status else 500)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        except Exception:
+            if not status:
+                observe(metrics.http_latency, 500)
+            raise
+
+
+app.add_middleware(RequestLatencyMiddleware)
+
 # --- Include existing API routers ---
 app.include_router(stream_router)
 app.include_router(stremio_router)
@@ -64,6 +108,18 @@ async def set_theme_route(request: Request, theme: str = Form(...)):
 async def public_status(request: Request):
     return await public_status_page(request)
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(request: Request):
+    # Scrapers authenticate with METRICS_TOKEN; without one only a logged-in
+    # admin session may read the metrics.
+    if Telegram.METRICS_TOKEN:
+        authorized = compare_digest(request.headers.get("Authorization", ""), f"Bearer {Telegram.METRICS_TOKEN}")
+    else:
+        authorized = is_authenticated(request)
+    if not authorized:
+        return PlainTextResponse("Unauthorized", status_code=401)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/stremio", response_class=HTMLResponse)
 async def stremio_guide(request: Request):
     return await stremio_guide_page(request)
@@ -87,9 +143,10 @@ async def list_media(
     page: int = Query(1, ge=1), 
     page_size: int = Query(24, ge=1, le=100), 
     search: str = Query("", max_length=100),
+    cursor: str = Query("", max_length=512),
     _: bool = Depends(require_auth)
 ):
-    return await list_media_api(media_type, page, page_size, search)
+    return await list_media_api(media_type, page, page_size, search, cursor)
 
 @app.delete("/api/media/delete")
 async def delete_media(tmdb_id: int, db_index: int, media_type: str, _: bool = Depends(require_auth)):
@@ -132,6 +189,47 @@ async def get_workloads(_: bool = Depends(require_auth)):
         return {"loads": {}}
 
 
+@app.get("/api/system/scheduler")
+async def get_scheduler_state(_: bool = Depends(require_auth)):
+    from Backend.helper.admission import admission, fair_share
+    from Backend.helper.scheduler import scheduler
+    return {"bots": scheduler.snapshot(), "admission": admission.stats(), "fair_share": fair_share.stats()}
+
+
+@app.get("/api/system/cache")
+async def get_cache_stats(_: bool = Depends(require_auth)):
+    from Backend.helper.binge import binge
+    from Backend.helper.cache import cache_stats
+    from Backend.helper.chunk_cache import chunk_cache
+    from Backend.helper.message_batcher import message_batcher
+    from Backend.helper.prewarm import stream_prewarmer
+    from Backend.helper.disk_cache import disk_cache
+    from Backend.helper.header_cache import header_cache
+    from Backend.helper.readahead import readahead
+    from Backend.helper.search_index import search_index
+    return {
+        "chunk_cache": chunk_cache.stats(),
+        "disk_cache": disk_cache.stats(),
+        "header_cache": header_cache.stats(),
+        "readahead": readahead.stats(),
+        "binge": binge.stats(),
+        "stremio_prewarm": stream_prewarmer.stats(),
+        "message_batcher": message_batcher.stats(),
+        "search_index": search_index.stats(),
+        "caches": cache_stats(),
+    }
+
+
+@app.get("/api/system/indexes")
+async def get_index_report(_: bool = Depends(require_auth)):
+    from Backend import db
+    report = await db.index_report()
+    return {
+        "queries": report,
+        "unindexed": [f"{row['database']}:{row['query']}" for row in report if not row.get("indexed")],
+    }
+
+
 @app.exception_handler(401)
 async def auth_exception_handler(request: Request, exc):
     return RedirectResponse(url="/login", status_code=302)
@@ -1,17 +1,23 @@
-import math
 import secrets
 import mimetypes
-from typing import Tuple
+import weakref
+from typing import Dict, Tuple
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 
+from Backend.config import Telegram
+from Backend.helper.admission import StreamSlot, admission, fair_share
+from Backend.helper.binge import binge
 from Backend.helper.encrypt import decode_string
-from Backend.helper.exceptions import InvalidHash
-from Backend.helper.custom_dl import ByteStreamer
-from Backend.pyrofork.bot import StreamBot, work_loads, multi_clients
+from Backend.helper.exceptions import StreamRejected
+from Backend.helper.custom_dl import CHUNK_SIZE, get_streamer
+from Backend.helper.file_info import get_file_info
+from Backend.helper.header_cache import header_cache
+from Backend.helper.readahead import readahead
+from Backend.helper.scheduler import scheduler
+from Backend.logger import LOGGER
 
 router = APIRouter(tags=["Streaming"])
-class_cache = {}
 
 
 def parse_range_header(range_header: str, file_size: int) -> Tuple[int, int]:
@@ -35,23 +41,60 @@ def parse_range_header(range_header: str, file_size: int) -> Tuple[int, int]:
     return from_bytes, until_bytes
 
 
-@router.get("/dl/{id}/{name}")
-@router.head("/dl/{id}/{name}")
-async def stream_handler(request: Request, id: str, name: str):
-    decoded_data = await decode_string(id)
-    if not decoded_data.get("msg_id"):
+def build_stream_headers(file_info: dict, range_header: str, from_bytes: int, until_bytes: int) -> Tuple[dict, int]:
+    file_name = file_info.get("file_name") or f"{secrets.token_hex(2)}.unknown"
+    mime_type = file_info.get("mime_type") or mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    if not file_info.get("file_name") and "/" in mime_type:
+        file_name = f"{secrets.token_hex(2)}.{mime_type.split('/')[1]}"
+
+    headers = {
+        "Content-Type": mime_type,
+        "Content-Length": str(until_bytes - from_bytes + 1),
+        "Content-Disposition": f'inline; filename="{file_name}"',
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=3600, immutable",
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Expose-Headers": "Content-Length, Content-Range, Accept-Ranges",
+    }
+
+    if range_header:
+        headers["Content-Range"] = f"bytes {from_bytes}-{until_bytes}/{file_info['file_size']}"
+        status_code = 206
+    else:
+        status_code = 200
+    return headers, status_code
+
+
+async def resolve_stream_token(id: str) -> Tuple[int, int]:
+    try:
+        decoded_data = await decode_string(id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid id")
+    if not isinstance(decoded_data, dict) or not decoded_data.get("msg_id"):
         raise HTTPException(status_code=400, detail="Missing id")
+    return int(f"-100{decoded_data['chat_id']}"), int(decoded_data["msg_id"])
 
-    chat_id = f"-100{decoded_data['chat_id']}"
-    message = await StreamBot.get_messages(int(chat_id), int(decoded_data["msg_id"]))
-    file = message.video or message.document
-    file_hash = file.file_unique_id[:6]
+
+@router.head("/dl/{id}/{name}")
+async def stream_head_handler(request: Request, id: str, name: str):
+    # Answered from stored file info only: no media session, no GetFile.
+    chat_id, msg_id = await resolve_stream_token(id)
+    file_info = await get_file_info(chat_id, msg_id)
+    range_header = request.headers.get("Range", "")
+    from_bytes, until_bytes = parse_range_header(range_header, file_info["file_size"])
+    headers, status_code = build_stream_headers(file_info, range_header, from_bytes, until_bytes)
+    return Response(status_code=status_code, headers=headers)
+
+
+@router.get("/dl/{id}/{name}")
+async def stream_handler(request: Request, id: str, name: str):
+    chat_id, msg_id = await resolve_stream_token(id)
 
     return await media_streamer(
         request,
-        chat_id=int(chat_id),
-        id=int(decoded_data["msg_id"]),
-        secure_hash=file_hash
+        chat_id=chat_id,
+        id=msg_id,
+        token=id,
     )
 
 
@@ -59,59 +102,98 @@ async def media_streamer(
     request: Request,
     chat_id: int,
     id: int,
-    secure_hash: str,
+    token: str = "",
 ) -> StreamingResponse:
     range_header = request.headers.get("Range", "")
-    index = min(work_loads, key=work_loads.get)
-    faster_client = multi_clients[index]
-
-    tg_connect = class_cache.get(faster_client)
-    if not tg_connect:
-        tg_connect = ByteStreamer(faster_client)
-        class_cache[faster_client] = tg_connect
+    file_info = await get_file_info(chat_id, id)
+    # Unsatisfiable ranges are rejected before a bot is picked or touched.
+    from_bytes, until_bytes = parse_range_header(range_header, file_info["file_size"])
 
-    file_id = await tg_connect.get_file_properties(chat_id=chat_id, message_id=id)
-    if file_id.unique_id[:6] != secure_hash:
-        raise InvalidHash
+    try:
+        slot = await admission.acquire(file_info["dc_id"])
+    except StreamRejected as e:
+        raise HTTPException(status_code=503, detail=e.message, headers={"Retry-After": str(e.retry_after)})
+    slots = {slot.index: slot}
+    try:
+        return await start_stream(
+            request, slots, file_info, chat_id, id, range_header, from_bytes, until_bytes, token
+        )
+    except BaseException:
+        release_slots(slots)
+        raise
 
-    file_size = file_id.file_size
-    from_bytes, until_bytes = parse_range_header(range_header, file_size)
 
-    chunk_size = 1024 * 1024
-    offset = from_bytes - (from_bytes % chunk_size)
-    first_part_cut = from_bytes - offset
-    last_part_cut = (until_bytes % chunk_size) + 1
+async def start_stream(
+    request: Request,
+    slots: Dict[int, StreamSlot],
+    file_info: dict,
+    chat_id: int,
+    id: int,
+    range_header: str,
+    from_bytes: int,
+    until_bytes: int,
+    token: str = "",
+) -> StreamingResponse:
     req_length = until_bytes - from_bytes + 1
-    part_count = math.ceil(until_bytes / chunk_size) - math.floor(offset / chunk_size)
+    # Holds the admitted bot's slot; stripe lanes add theirs.
+    index = next(iter(slots))
+    tg_connect = get_streamer(index)
 
-    body = tg_connect.yield_file(
-        file_id, index, offset, first_part_cut, last_part_cut, part_count, chunk_size
-    )
+    file_id = await tg_connect.get_file_properties(chat_id=chat_id, message_id=id)
 
-    file_name = file_id.file_name or f"{secrets.token_hex(2)}.unknown"
-    mime_type = file_id.mime_type or mimetypes.guess_type(file_name)[0] or "application/octet-stream"
-    if not file_id.file_name and "/" in mime_type:
-        file_name = f"{secrets.token_hex(2)}.{mime_type.split('/')[1]}"
+    stripes = []
+    if Telegram.STREAM_STRIPES > 1 and req_length > CHUNK_SIZE:
+        for stripe_index in scheduler.ranked(file_info["dc_id"], exclude=[index]):
+            if len(stripes) + 1 >= Telegram.STREAM_STRIPES:
+                break
+            if scheduler.cooling_down(stripe_index) or not admission.has_room(stripe_index):
+                continue
+            stripe_streamer = get_streamer(stripe_index)
+            try:
+                stripe_file_id = await stripe_streamer.get_file_properties(chat_id=chat_id, message_id=id)
+            except Exception as e:
+                LOGGER.warning(f"Skipping client {stripe_index} for striping: {e}")
+                continue
+            lane = admission.try_lane(stripe_index)
+            if lane is None:
+                continue
+            slots[stripe_index] = lane
+            stripes.append((stripe_index, stripe_streamer, stripe_file_id))
+
+    header_cache.schedule(tg_connect, file_id, index)
+    viewer = request.client.host if request.client else ""
+    sequential = readahead.observe(viewer, file_id.media_id, from_bytes)
+    body = admitted_body(
+        slots,
+        fair_share.pace(viewer, binge.track(
+            token, from_bytes, file_info["file_size"], sequential,
+            tg_connect.yield_file(
+                file_id, index, from_bytes, until_bytes,
+                stripes=stripes, viewer=viewer, sequential=sequential, slots=slots,
+            ),
+        )),
+    )
+    # Frees the slots even if the response is dropped before the body starts.
+    weakref.finalize(body, release_slots, slots)
 
-    headers = {
-        "Content-Type": mime_type,
-        "Content-Length": str(req_length),
-        "Content-Disposition": f'inline; filename="{file_name}"',
-        "Accept-Ranges": "bytes",
-        "Cache-Control": "public, max-age=3600, immutable",
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Expose-Headers": "Content-Length, Content-Range, Accept-Ranges",
-    }
-    
-    if range_header:
-        headers["Content-Range"] = f"bytes {from_bytes}-{until_bytes}/{file_size}"
-        status_code = 206
-    else:
-        status_code = 200
-    
+    headers, status_code = build_stream_headers(file_info, range_header, from_bytes, until_bytes)
     return StreamingResponse(
         status_code=status_code,
         content=body,
         headers=headers,
-        media_type=mime_type,
-    )
\ No newline at end of file
+        media_type=headers["Content-Type"],
+    )
+
+
+def release_slots(slots: Dict[int, StreamSlot]) -> None:
+    for slot in list(slots.values()):
+        slot.release()
+
+
+async def admitted_body(slots: Dict[int, StreamSlot], body):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        await body.aclose()
+        release_slots(slots)
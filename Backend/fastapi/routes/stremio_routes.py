@@ -3,6 +3,7 @@ from typing import Optional
 from urllib.parse import unquote
 from Backend.config import Telegram
 from Backend import db, __version__
+from Backend.helper.prewarm import stream_prewarmer
 
 # --- Configuration ---
 BASE_URL = Telegram.BASE_URL
@@ -145,10 +146,11 @@ async def get_catalog(media_type: str, id: str, extra: Optional[str] = None):
     
     try:
         if search_query:
-            search_results = await db.search_documents(query=search_query, page=page, page_size=PAGE_SIZE)
-            all_items = search_results.get("results", [])
             db_media_type = "tv" if media_type == "series" else "movie"
-            items = [item for item in all_items if item.get("media_type") == db_media_type]
+            search_results = await db.search_documents(
+                query=search_query, page=page, page_size=PAGE_SIZE, media_type=db_media_type
+            )
+            items = search_results.get("results", [])
         else:
             if "latest" in id:
                 sort_params = [("updated_on", "desc")]
@@ -248,5 +250,7 @@ async def get_streams(media_type: str, id: str):
         for quality in media_details.get("telegram", [])
         if quality.get("id")
     ]
+    # Stremio asks for streams shortly before play; get the files ready now.
+    stream_prewarmer.schedule(quality["id"] for quality in media_details.get("telegram", []) if quality.get("id"))
     
     return {"streams": streams}
@@ -0,0 +1,213 @@
+import asyncio
+from math import ceil
+from time import monotonic
+from typing import AsyncIterator, Dict, Optional
+from Backend.config import Telegram
+from Backend.helper import metrics
+from Backend.helper.exceptions import StreamRejected
+from Backend.helper.scheduler import scheduler
+
+
+# Each viewer may burst this many seconds of its share before being paced.
+BURST_SECONDS = 2
+MIN_BURST = 2 * 1024 * 1024
+# Buckets outlive their streams for this long, so re-opening ranges does not
+# hand a viewer a fresh burst every time.
+BUCKET_IDLE = 30
+
+
+class StreamSlot:
+    """One admitted stream on bot `index`; releasing it twice is harmless.
+
+    A `lane` slot is an extra bot pulling parts of an already admitted
+    stream: it counts against the per-bot limit but not the global one.
+    """
+
+    def __init__(self, controller: "AdmissionControl", index: int, lane: bool = False):
+        self.controller = controller
+        self.index = index
+        self.lane = lane
+        self.released = False
+
+    def move(self, index: int) -> bool:
+        """Hand this slot over to bot `index`, if it has room."""
+        if self.released or not self.controller.has_room(index):
+            return False
+        self.controller._move(self.index, index)
+        self.index = index
+        return True
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self.index, self.lane)
+
+
+class AdmissionControl:
+    """Global and per-bot limits on concurrent streams.
+
+    A stream that cannot be placed waits up to `timeout` seconds for a slot
+    in a queue of at most `queue_size` waiters, then is rejected. A limit of
+    0 means unlimited.
+    """
+
+    def __init__(self, max_streams: int, max_per_bot: int, queue_size: int, timeout: float):
+        self.max_streams = max_streams
+        self.max_per_bot = max_per_bot
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.per_bot: Dict[int, int] = {}
+        self.waiting = 0
+        self.rejected = 0
+        self._released = asyncio.Event()
+
+    def has_room(self, index: int) -> bool:
+        return not self.max_per_bot or self.per_bot.get(index, 0) < self.max_per_bot
+
+    def _place(self, dc_id: int) -> Optional[int]:
+        if self.max_streams and self.active >= self.max_streams:
+            return None
+        full = [index for index, count in self.per_bot.items() if self.max_per_bot and count >= self.max_per_bot]
+        ranked = scheduler.ranked(dc_id, exclude=full)
+        if ranked:
+            return ranked[0]
+        return None if full else scheduler.pick(dc_id)
+
+    def _reject(self) -> StreamRejected:
+        self.rejected += 1
+        metrics.stream_rejections.inc()
+        return StreamRejected(max(1, ceil(self.timeout)))
+
+    async def acquire(self, dc_id: int) -> StreamSlot:
+        index = self._place(dc_id)
+        if index is None:
+            if self.waiting >= self.queue_size:
+                raise self._reject()
+            self.waiting += 1
+            deadline = monotonic() + self.timeout
+            try:
+                while index is None:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        raise self._reject()
+                    try:
+                        await asyncio.wait_for(self._released.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    index = self._place(dc_id)
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.per_bot[index] = self.per_bot.get(index, 0) + 1
+        return StreamSlot(self, index)
+
+    def try_lane(self, index: int) -> Optional[StreamSlot]:
+        """A lane slot on bot `index`, or None when that bot is at its limit."""
+        if not self.has_room(index):
+            return None
+        self.per_bot[index] = self.per_bot.get(index, 0) + 1
+        return StreamSlot(self, index, lane=True)
+
+    def _move(self, old: int, new: int) -> None:
+        self.per_bot[old] -= 1
+        self.per_bot[new] = self.per_bot.get(new, 0) + 1
+        self._wake()
+
+    def _release(self, index: int, lane: bool = False) -> None:
+        if not lane:
+            self.active -= 1
+        self.per_bot[index] -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        # Wake every waiter; each re-checks whether it can be placed now.
+        self._released.set()
+        self._released = asyncio.Event()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "per_bot": {f"bot{index + 1}": count for index, count in sorted(self.per_bot.items())},
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "max_streams": self.max_streams,
+            "max_per_bot": self.max_per_bot,
+        }
+
+
+class FairShare:
+    """Splits a total bandwidth budget evenly between active viewers.
+
+    Each viewer has a token bucket refilled at `rate / active viewers`, so a
+    viewer with many parallel ranges gets the same share as one with a single
+    stream. Body chunks are paced against it, and because the prefetch window
+    is bounded, so are that viewer's GetFile calls.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._streams: Dict[str, int] = {}
+        self._buckets: Dict[str, list] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _share(self) -> float:
+        return self.rate / max(1, len(self._streams))
+
+    def open(self, viewer: str) -> None:
+        now = monotonic()
+        for idle in [v for v, bucket in self._buckets.items() if v not in self._streams and now - bucket[1] > BUCKET_IDLE]:
+            del self._buckets[idle]
+        self._streams[viewer] = self._streams.get(viewer, 0) + 1
+        if viewer not in self._buckets:
+            self._buckets[viewer] = [max(MIN_BURST, self._share() * BURST_SECONDS), now]
+
+    def close(self, viewer: str) -> None:
+        self._streams[viewer] -= 1
+        if not self._streams[viewer]:
+            del self._streams[viewer]
+
+    async def consume(self, viewer: str, nbytes: int) -> None:
+        bucket = self._buckets.get(viewer)
+        if bucket is None:
+            return
+        share = self._share()
+        now = monotonic()
+        burst = max(MIN_BURST, share * BURST_SECONDS)
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * share) - nbytes
+        bucket[1] = now
+        if bucket[0] < 0:
+            await asyncio.sleep(-bucket[0] / share)
+
+    async def pace(self, viewer: str, body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        if not self.enabled:
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                await body.aclose()
+            return
+        self.open(viewer)
+        try:
+            async for chunk in body:
+                await self.consume(viewer, len(chunk))
+                yield chunk
+        finally:
+            self.close(viewer)
+            await body.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "viewers": len(self._streams),
+            "share": round(self._share()) if self._streams else self.rate,
+        }
+
+
+admission = AdmissionControl(
+    Telegram.MAX_STREAMS, Telegram.MAX_STREAMS_PER_BOT, Telegram.STREAM_QUEUE_SIZE, Telegram.STREAM_QUEUE_TIMEOUT
+)
+fair_share = FairShare(Telegram.STREAM_BANDWIDTH * 1024 * 1024)
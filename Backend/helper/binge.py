@@ -0,0 +1,112 @@
+import asyncio
+import re
+from typing import AsyncIterator, Dict, List, Optional, Set
+from Backend import db
+from Backend.config import Telegram
+from Backend.helper.cache import AsyncTTLCache
+from Backend.helper.prewarm import warm_token
+from Backend.logger import LOGGER
+
+
+# Playback past this fraction of the file counts as "near the end".
+BINGE_THRESHOLD = 0.9
+
+
+def _resolution(quality: str) -> int:
+    match = re.search(r"(\d{3,4})p", quality or "")
+    return int(match.group(1)) if match else 0
+
+
+def pick_quality(qualities: List[Dict], wanted: str) -> Optional[Dict]:
+    """Same quality as the current episode if present, else the closest resolution."""
+    qualities = [q for q in qualities if q.get("id")]
+    if not qualities:
+        return None
+    for quality in qualities:
+        if quality.get("quality") == wanted:
+            return quality
+    target = _resolution(wanted)
+    return min(qualities, key=lambda q: (abs(_resolution(q.get("quality")) - target), -_resolution(q.get("quality"))))
+
+
+class BingePrefetch:
+    """When a viewer nears the end of an episode, warms the opening of the
+    next one (same season, else the first episode of the next season) so
+    autoplay-next starts from the chunk cache."""
+
+    def __init__(self):
+        self._seen = AsyncTTLCache("binge", 4096, 6 * 3600)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _trigger(self, token: str) -> None:
+        if token in self._seen:
+            return
+        self._seen.set(token, True)
+        task = asyncio.create_task(self._run(token))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def track(
+        self, token: str, from_bytes: int, file_size: int, sequential: bool, body: AsyncIterator[bytes]
+    ) -> AsyncIterator[bytes]:
+        """Pass `body` through, prefetching once playback reaches the end.
+
+        A range that already starts past the threshold only counts when it
+        continues sequential playback: players probe the tail of a file for
+        its index (MKV Cues, MP4 `moov`) every time it is opened.
+        """
+        threshold = file_size * BINGE_THRESHOLD
+        if not token or Telegram.BINGE_PREFETCH <= 0 or not file_size:
+            threshold = float("inf")
+        elif from_bytes >= threshold:
+            if sequential:
+                self._trigger(token)
+            threshold = float("inf")
+        position = from_bytes
+        try:
+            async for chunk in body:
+                position += len(chunk)
+                if position >= threshold:
+                    self._trigger(token)
+                    threshold = float("inf")
+                yield chunk
+        finally:
+            await body.aclose()
+
+    async def _run(self, token: str) -> None:
+        try:
+            episode = await db.find_episode_by_file(token)
+            if not episode:
+                return
+            next_token = await self.next_episode_token(episode)
+            if not next_token:
+                return
+            warmed = await warm_token(next_token, Telegram.BINGE_PREFETCH * 1024 * 1024)
+            LOGGER.info(
+                f"Prefetched {warmed // 1024} KB of the episode after "
+                f"S{episode['season_number']}E{episode['episode_number']} of {episode['tmdb_id']}"
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            LOGGER.warning(f"Binge prefetch failed: {e}")
+
+    @staticmethod
+    async def next_episode_token(episode: Dict) -> Optional[str]:
+        tmdb_id, db_index = episode["tmdb_id"], episode["db_index"]
+        season_number, episode_number = episode["season_number"], episode["episode_number"]
+        details = await db.get_media_details(tmdb_id, db_index, season_number, episode_number + 1)
+        if not details:
+            season = await db.get_media_details(tmdb_id, db_index, season_number + 1)
+            episodes = season.get("episodes", []) if season else []
+            if not episodes:
+                return None
+            details = min(episodes, key=lambda e: e.get("episode_number", 0))
+        quality = pick_quality(details.get("telegram", []), episode["quality"])
+        return quality["id"] if quality else None
+
+    def stats(self) -> Dict[str, int]:
+        return {"tracked": len(self._seen), "running": len(self._tasks)}
+
+
+binge = BingePrefetch()
@@ -0,0 +1,180 @@
+import asyncio
+import random
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+# Expiry times are spread by this fraction so entries loaded together do not
+# all go cold together.
+TTL_JITTER = 0.1
+
+caches: Dict[str, "AsyncTTLCache"] = {}
+
+
+class SingleFlight:
+    """One shared call per key for concurrent callers.
+
+    The call is cancelled once every caller waiting on it has gone, and a
+    call that is finished or being cancelled is never joined; the next
+    caller starts a fresh one.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, List] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._calls.get(key)
+        return entry is not None and not entry[0].done() and not entry[0].cancelling()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(
+        self, key: Hashable, call: Callable[[], Awaitable[Any]], on_result: Callable[[Any], None]
+    ) -> Any:
+        """Await the shared `call` for `key`; `on_result` gets its value once."""
+        if key in self:
+            entry = self._calls[key]
+        else:
+            task = asyncio.create_task(call())
+            entry = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda t: self._finished(key, t, on_result))
+
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                self._forget(key, entry[0])
+                entry[0].cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        entry = self._calls.get(key)
+        if entry is not None and entry[0] is task:
+            del self._calls[key]
+
+    def _finished(self, key: Hashable, task: asyncio.Task, on_result: Callable[[Any], None]) -> None:
+        self._forget(key, task)
+        if not task.cancelled() and task.exception() is None:
+            on_result(task.result())
+
+
+class AsyncTTLCache:
+    """Size-bounded LRU cache with per-entry TTL and single-flight loading.
+
+    Concurrent misses for the same key share one loader call; failed loads are
+    not cached. With `sliding`, every hit pushes the entry's expiry back.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: Optional[float] = None, sliding: bool = False):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sliding = sliding
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.joins = 0
+        self.expirations = 0
+        self.evictions = 0
+        caches[name] = self
+
+    def _expiry(self, ttl: Optional[float]) -> float:
+        ttl = self.ttl if ttl is None else ttl
+        if not ttl:
+            return float("inf")
+        return monotonic() + ttl * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER)
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires = entry
+        if expires <= monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        if self.sliding:
+            self._entries[key] = (value, self._expiry(None))
+        return True, value
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        found, value = self._lookup(key)
+        if not found:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry without touching LRU order or counters."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= monotonic():
+            return default
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (value, self._expiry(ttl))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def prune(self) -> int:
+        now = monotonic()
+        expired = [key for key, (_, expires) in self._entries.items() if expires <= now]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+        return len(expired)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            return value
+
+        if key in self._inflight:
+            self.joins += 1
+        else:
+            self.misses += 1
+        return await self._inflight.run(key, loader, lambda value: self.set(key, value, ttl))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.joins
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "joins": self.joins,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.joins) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def cache_stats() -> Dict[str, dict]:
+    return {name: cache.stats() for name, cache in sorted(caches.items())}
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+from Backend.config import Telegram
+from Backend.helper.cache import SingleFlight
+
+
+CHUNK_SIZE = 1024 * 1024
+ChunkKey = Tuple[int, int]
+
+
+class ChunkCache:
+    """Process-wide LRU cache of downloaded chunks keyed by (media_id, offset).
+
+    Concurrent misses for the same key share one fetch, so several viewers of
+    the same release only pull each chunk from Telegram once.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._chunks: "OrderedDict[ChunkKey, bytes]" = OrderedDict()
+        self._inflight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.joins = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: ChunkKey) -> Optional[bytes]:
+        data = self._chunks.get(key)
+        if data is not None:
+            self._chunks.move_to_end(key)
+            self.hits += 1
+        return data
+
+    def put(self, key: ChunkKey, data: bytes) -> None:
+        if not self.enabled or not data or len(data) > self.max_bytes:
+            return
+        old = self._chunks.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._chunks[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._chunks.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key: ChunkKey, fetch: Callable[[], Awaitable[bytes]]) -> bytes:
+        if not self.enabled:
+            return await fetch()
+
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        if key in self._inflight:
+            self.joins += 1
+        else:
+            self.misses += 1
+        return await self._inflight.run(key, fetch, lambda data: self.put(key, data))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.joins
+        return {
+            "enabled": self.enabled,
+            "max_bytes": self.max_bytes,
+            "used_bytes": self.size,
+            "chunks": len(self._chunks),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "joins": self.joins,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.joins) / lookups, 4) if lookups else 0.0,
+        }
+
+
+chunk_cache = ChunkCache(Telegram.CHUNK_CACHE_SIZE * 1024 * 1024)
@@ -1,114 +1,410 @@
 import asyncio
+from collections import deque
+from time import monotonic
+from functools import partial
 from pyrogram import utils, raw
-from pyrogram.errors import AuthBytesInvalid
+from pyrogram.errors import AuthBytesInvalid, FileReferenceExpired, FloodWait, RPCError
 from pyrogram.file_id import FileId, FileType, ThumbnailSource
 from pyrogram.session import Session, Auth
-from typing import Dict, Union
+from typing import Deque, Dict, List, Optional, Tuple, Union
 from Backend.logger import LOGGER
+from Backend.config import Telegram
+from Backend.helper.admission import StreamSlot, admission
+from Backend.helper.cache import AsyncTTLCache
+from Backend.helper.chunk_cache import CHUNK_SIZE, chunk_cache
+from Backend.helper.disk_cache import disk_cache
 from Backend.helper.exceptions import FIleNotFound
+from Backend.helper.header_cache import header_cache
+from Backend.helper.file_info import decode_file_id, get_file_info, store_file_id
+from Backend.helper import metrics
 from Backend.helper.pyro import get_file_ids
-from Backend.pyrofork.bot import work_loads
+from Backend.helper.readahead import readahead
+from Backend.helper.scheduler import scheduler
+from Backend.pyrofork.bot import multi_clients, work_loads
 from pyrogram import Client, utils, raw
 
 
+MIN_PART_SIZE = 4096
+FAILOVER_BACKOFF = 0.5
+# Errors that end one bot's part of a stream but leave other bots usable.
+STREAM_ERRORS = (TimeoutError, AttributeError, OSError, EOFError, RPCError)
+
+
+def plan_parts(from_bytes: int, until_bytes: int) -> List[Tuple[int, int]]:
+    """Split a byte range into (offset, limit) GetFile requests.
+
+    Requests start small and double up to CHUNK_SIZE, so the first bytes of a
+    seek or a short probe arrive without downloading a full megabyte. Every
+    limit is a power of two between 4 KiB and 1 MiB and every offset is a
+    multiple of its limit, which keeps each request inside one 1 MiB block
+    as upload.getFile requires.
+    """
+    first = max(MIN_PART_SIZE, min(CHUNK_SIZE, Telegram.STREAM_FIRST_CHUNK * 1024))
+    desired = 1 << (first.bit_length() - 1)
+    position = from_bytes - from_bytes % MIN_PART_SIZE
+    parts = []
+    while position <= until_bytes:
+        remaining = until_bytes + 1 - position
+        limit = min(desired, CHUNK_SIZE, max(MIN_PART_SIZE, 1 << (remaining - 1).bit_length()))
+        if position:
+            limit = min(limit, position & -position)
+        parts.append((position, limit))
+        position += limit
+        desired = min(desired * 2, CHUNK_SIZE)
+    return parts
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # Prefetch tasks may finish after the viewer has gone away; mark their
+    # result as retrieved so asyncio doesn't log it.
+    if not task.cancelled():
+        task.exception()
+
+
+class MediaSessionPool:
+    """Up to MEDIA_SESSIONS_PER_DC media sessions of one bot on one DC.
+
+    Requests go to the least busy started session and a new one is opened
+    while all are busy. Sessions that drop their connection are discarded
+    and replaced on the next acquire.
+    """
+
+    def __init__(self, client: Client, dc_id: int, size: int):
+        self.client = client
+        self.dc_id = dc_id
+        self.size = max(1, size)
+        self.sessions: List[Session] = []
+        self.busy: Dict[Session, int] = {}
+        self.auth_key: Optional[bytes] = None
+        self._lock = asyncio.Lock()
+
+    def _least_busy(self) -> Optional[Session]:
+        ready = [session for session in self.sessions if session.is_started.is_set()]
+        return min(ready, key=self.busy.get, default=None)
+
+    def _needs_session(self, session: Optional[Session]) -> bool:
+        return session is None or (self.busy[session] > 0 and len(self.sessions) < self.size)
+
+    async def acquire(self) -> Session:
+        session = self._least_busy()
+        if self._needs_session(session):
+            async with self._lock:
+                session = self._least_busy()
+                if self._needs_session(session):
+                    if len(self.sessions) >= self.size:
+                        # Full and nothing started: replace the oldest session.
+                        self.discard(self.sessions[0])
+                    session = await self._create()
+        self.busy[session] += 1
+        return session
+
+    async def warm(self) -> None:
+        if self._least_busy() is None:
+            self.release(await self.acquire())
+
+    async def prune(self, timeout: float = 10) -> int:
+        dead = 0
+        for session in list(self.sessions):
+            if session.is_started.is_set() or self.busy.get(session):
+                continue
+            try:
+                # Sessions restart themselves after transport errors; give them a moment.
+                await asyncio.wait_for(session.is_started.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.discard(session)
+                dead += 1
+        return dead
+
+    def release(self, session: Session) -> None:
+        if session in self.busy:
+            self.busy[session] -= 1
+
+    def discard(self, session: Session) -> None:
+        if session not in self.busy:
+            return
+        self.sessions.remove(session)
+        del self.busy[session]
+        if self.client.media_sessions.get(self.dc_id) is session:
+            self.client.media_sessions.pop(self.dc_id, None)
+            if self.sessions:
+                self.client.media_sessions[self.dc_id] = self.sessions[0]
+        LOGGER.debug(f"Discarded media session for DC {self.dc_id}")
+        task = asyncio.create_task(session.stop())
+        task.add_done_callback(_consume_exception)
+
+    async def _create(self) -> Session:
+        client, dc_id = self.client, self.dc_id
+        test_mode = await client.storage.test_mode()
+        if dc_id == await client.storage.dc_id():
+            media_session = Session(client, dc_id, await client.storage.auth_key(), test_mode, is_media=True)
+            await media_session.start()
+        elif self.auth_key:
+            # The key was already authorized by the first session of this pool.
+            media_session = Session(client, dc_id, self.auth_key, test_mode, is_media=True)
+            await media_session.start()
+        else:
+            media_session = Session(
+                client,
+                dc_id,
+                await Auth(client, dc_id, test_mode).create(),
+                test_mode,
+                is_media=True,
+            )
+            await media_session.start()
+            for _ in range(6):
+                exported_auth = await client.invoke(raw.functions.auth.ExportAuthorization(dc_id=dc_id))
+                try:
+                    await media_session.send(raw.functions.auth.ImportAuthorization(id=exported_auth.id, bytes=exported_auth.bytes))
+                    break
+                except AuthBytesInvalid:
+                    LOGGER.debug(f"Invalid authorization bytes for DC {dc_id}, retrying...")
+                except OSError:
+                    LOGGER.debug(f"Connection error, retrying...")
+                    await asyncio.sleep(2)
+            else:
+                await media_session.stop()
+                raise ConnectionError(f"Failed to establish media session for DC {dc_id} after multiple retries")
+            self.auth_key = media_session.auth_key
+
+        self.sessions.append(media_session)
+        self.busy[media_session] = 0
+        client.media_sessions.setdefault(dc_id, media_session)
+        metrics.media_sessions_created.inc(dc_id)
+        LOGGER.debug(f"Created media session {len(self.sessions)}/{self.size} for DC {dc_id}")
+        return media_session
+
+
+media_pools: Dict[Tuple[Client, int], MediaSessionPool] = {}
+
+
+def get_media_pool(client: Client, dc_id: int) -> MediaSessionPool:
+    pool = media_pools.get((client, dc_id))
+    if pool is None:
+        pool = media_pools[(client, dc_id)] = MediaSessionPool(client, dc_id, Telegram.MEDIA_SESSIONS_PER_DC)
+    return pool
+
+
 class ByteStreamer:
-    def __init__(self, client: Client):
-        self.clean_timer = 30 * 60
+    def __init__(self, client: Client, index: int):
         self.client: Client = client
-        self.__cached_file_ids: Dict[int, FileId] = {}
-        asyncio.create_task(self.clean_cache())
+        self.index = index
+        self.__cached_file_ids = AsyncTTLCache(
+            f"file_ids.bot{index + 1}", Telegram.FILE_INFO_CACHE_SIZE, Telegram.FILE_ID_CACHE_TTL
+        )
+        self.__refreshing: Dict[Tuple[int, int], asyncio.Task] = {}
 
     async def get_file_properties(self, chat_id: int, message_id: int) -> FileId:
-        if message_id not in self.__cached_file_ids:
-            file_id = await get_file_ids(self.client, int(chat_id), int(message_id))
+        key = (int(chat_id), int(message_id))
+        return await self.__cached_file_ids.get_or_load(key, lambda: self.resolve_file_id(key))
+
+    async def resolve_file_id(self, key: Tuple[int, int]) -> FileId:
+        info = await get_file_info(*key)
+        file_id = decode_file_id(info, self.client.me.id)
+        if not file_id:
+            # First time this bot streams the file; file ids are per bot.
+            file_id = await get_file_ids(self.client, *key)
             if not file_id:
-                LOGGER.info('Message with ID %s not found!', message_id)
+                LOGGER.info('Message with ID %s not found!', key[1])
                 raise FIleNotFound
-            self.__cached_file_ids[message_id] = file_id
-        return self.__cached_file_ids[message_id]
-
-    async def yield_file(self, file_id: FileId, index: int, offset: int, first_part_cut: int, last_part_cut: int, part_count: int, chunk_size: int) -> Union[str, None]: # type: ignore
-        client = self.client
-        work_loads[index] += 1
-        LOGGER.debug(f"Starting to yielding file with client {index}.")
-        media_session = await self.generate_media_session(client, file_id)
-        current_part = 1
-        location = await self.get_location(file_id)
+            await store_file_id(*key, self.client, file_id)
+        setattr(file_id, 'message_ref', key)
+        return file_id
+
+    async def refresh_file_reference(self, file_id: FileId) -> None:
+        key = file_id.message_ref
+        task = self.__refreshing.get(key)
+        if task is None:
+            task = self.__refreshing[key] = asyncio.create_task(get_file_ids(self.client, *key))
+            task.add_done_callback(lambda _: self.__refreshing.pop(key, None))
+        fresh = await asyncio.shield(task)
+        if file_id.file_reference != fresh.file_reference:
+            LOGGER.info(f"Refreshed file reference for message {key[1]}")
+            # Updated in place so every lane holding this FileId picks it up.
+            file_id.file_reference = fresh.file_reference
+            await store_file_id(*key, self.client, file_id)
+
+    async def yield_file(self, file_id: FileId, index: int, from_bytes: int, until_bytes: int, stripes: Optional[List[Tuple[int, "ByteStreamer", FileId]]] = None, viewer: Optional[str] = None, sequential: bool = False, slots: Optional[Dict[int, StreamSlot]] = None) -> Union[str, None]: # type: ignore
+        # `stripes` are extra (index, streamer, file_id) lanes on other bots; the
+        # parts of the range are spread round-robin over this bot and those.
+        # `slots` maps each member's bot to its admission slot and follows failovers.
+        members = [(index, self, file_id)] + list(stripes or [])
+        for member_index, _, _ in members:
+            work_loads[member_index] += 1
+        LOGGER.debug(f"Starting to yielding file with clients {[m[0] for m in members]}.")
+        parts = plan_parts(from_bytes, until_bytes)
+        current_part = 0
+        prefetch = max(1, Telegram.STREAM_PREFETCH, len(members))
+        # Tasks are queued in offset order, so awaiting the head of the deque
+        # reorders the responses while at most `prefetch` chunks are buffered.
+        pending: Deque[Tuple[asyncio.Task, Tuple[int, "ByteStreamer", FileId]]] = deque()
+        scheduled = 0
+        position = from_bytes
+        failovers = 0
+        failed = set()
+        started = monotonic()
+        first_byte = None
         try:
-            r = await media_session.send(raw.functions.upload.GetFile(location=location, offset=offset, limit=chunk_size))
-            if isinstance(r, raw.types.upload.File):
-                while True:
-                    chunk = r.bytes
+            while current_part < len(parts):
+                while scheduled < len(parts) and len(pending) < prefetch:
+                    member = members[scheduled % len(members)]
+                    task = asyncio.create_task(member[1].read_part(member[2], *parts[scheduled]))
+                    task.add_done_callback(_consume_exception)
+                    pending.append((task, member))
+                    scheduled += 1
+                    if scheduled == len(parts) and viewer and sequential:
+                        # Sequential playback: keep fetching past the range.
+                        readahead.start(viewer, members[0][1], members[0][2], members[0][0], until_bytes + 1)
+
+                task, member = pending.popleft()
+                try:
+                    chunk = await task
                     if not chunk:
+                        raise EOFError(f"Empty chunk at offset {parts[current_part][0]}")
+                except STREAM_ERRORS as e:
+                    if failovers >= Telegram.STREAM_FAILOVER_RETRIES:
+                        LOGGER.error(f"Giving up on media {file_id.media_id} at byte {position} after {failovers} failovers: {e}")
                         break
-                    elif part_count == 1:
-                        yield chunk[first_part_cut:last_part_cut]
-                    elif current_part == 1:
-                        yield chunk[first_part_cut:]
-                    elif current_part == part_count:
-                        yield chunk[:last_part_cut]
-                    else:
-                        yield chunk
-
-                    current_part += 1
-                    offset += chunk_size
-
-                    if current_part > part_count:
+                    LOGGER.warning(f"Client {member[0]} failed at byte {position} of media {file_id.media_id}: {e!r}")
+                    metrics.stream_failovers.inc(member[0])
+                    failed.add(member[0])
+                    members = await self.replace_member(members, member, file_id, failed, slots)
+                    if not members:
+                        LOGGER.error(f"No client left to resume media {file_id.media_id} at byte {position}")
                         break
-                    
-                    r = await media_session.send(
-                        raw.functions.upload.GetFile(
-                            location=location, offset=offset, limit=chunk_size
-                        ),
-                    )
-        except (TimeoutError, AttributeError):
-            pass
+                    # Everything from the failed part on is requested again.
+                    for queued, _ in pending:
+                        queued.cancel()
+                    pending.clear()
+                    scheduled = current_part
+                    await asyncio.sleep(FAILOVER_BACKOFF * 2 ** failovers)
+                    failovers += 1
+                    continue
+
+                part_offset = parts[current_part][0]
+                data = chunk[max(from_bytes - part_offset, 0):until_bytes + 1 - part_offset]
+                position += len(data)
+                if first_byte is None:
+                    first_byte = monotonic()
+                    metrics.stream_ttfb.observe(first_byte - started, index, file_id.dc_id)
+                metrics.stream_bytes.inc(member[0], file_id.dc_id, amount=len(data))
+                yield data
+                current_part += 1
         finally:
-            LOGGER.debug("Finished yielding file with {current_part} parts.")
-            work_loads[index] -= 1
-
-    async def generate_media_session(self, client: Client, file_id: FileId) -> Session:
-        media_session = client.media_sessions.get(file_id.dc_id, None)
-        if media_session is None:
-            if file_id.dc_id != await client.storage.dc_id():
-                media_session = Session(
-                    client,
-                    file_id.dc_id,
-                    await Auth(client, file_id.dc_id, await client.storage.test_mode()).create(),
-                    await client.storage.test_mode(),
-                    is_media=True,
-                )
-                await media_session.start()
-                for _ in range(6):
-                    exported_auth = await client.invoke(raw.functions.auth.ExportAuthorization(dc_id=file_id.dc_id))
-                    try:
-                        
-                        await media_session.send(raw.functions.auth.ImportAuthorization(id=exported_auth.id, bytes=exported_auth.bytes))
-                        break
-                    except AuthBytesInvalid:
-                        LOGGER.debug(f"Invalid authorization bytes for DC {file_id.dc_id}, retrying...")
-                    except OSError:
-                        LOGGER.debug(f"Connection error, retrying...")
-                        await asyncio.sleep(2)
-                else:
-                    await media_session.stop()
-                    LOGGER.debug(f"Failed to establish media session for DC {file_id.dc_id} after multiple retries")
-                    return None 
+            for task, _ in pending:
+                task.cancel()
+            if viewer:
+                readahead.advance(viewer, file_id.media_id, position)
+            if position - from_bytes >= CHUNK_SIZE:
+                metrics.stream_throughput.observe((position - from_bytes) / max(monotonic() - started, 1e-3), index, file_id.dc_id)
+            LOGGER.debug(f"Finished yielding file with {current_part} parts.")
+            for member_index, _, _ in members:
+                work_loads[member_index] -= 1
+
+    @staticmethod
+    async def replace_member(members: List[Tuple[int, "ByteStreamer", FileId]], member: Tuple[int, "ByteStreamer", FileId], file_id: FileId, failed: set, slots: Optional[Dict[int, StreamSlot]] = None) -> List[Tuple[int, "ByteStreamer", FileId]]:
+        """Swap a failed lane for the best healthy bot not already streaming
+        this range and below its stream limit; the lane is just dropped when
+        no such bot exists."""
+        remaining = [m for m in members if m is not member]
+        work_loads[member[0]] -= 1
+        slot = slots.pop(member[0], None) if slots is not None else None
+        exclude = failed | {m[0] for m in remaining}
+        for candidate in scheduler.ranked(file_id.dc_id, exclude=exclude):
+            if scheduler.cooling_down(candidate) or not admission.has_room(candidate):
+                continue
+            streamer = get_streamer(candidate)
+            try:
+                candidate_file_id = await streamer.get_file_properties(*file_id.message_ref)
+            except Exception as e:
+                LOGGER.warning(f"Client {candidate} cannot take over media {file_id.media_id}: {e}")
+                failed.add(candidate)
+                continue
+            if slot is not None and not slot.move(candidate):
+                continue
+            LOGGER.info(f"Client {candidate} took over media {file_id.media_id} from client {member[0]}")
+            work_loads[candidate] += 1
+            if slot is not None:
+                slots[candidate] = slot
+            return [(candidate, streamer, candidate_file_id)] + remaining
+        if slot is not None:
+            if slot.lane:
+                slot.release()
             else:
-                media_session = Session(
-                    client,
-                    file_id.dc_id,
-                    await client.storage.auth_key(),
-                    await client.storage.test_mode(),
-                    is_media=True,
-                )
-                await media_session.start()
-            LOGGER.debug(f"Created media session for DC {file_id.dc_id}")
-            client.media_sessions[file_id.dc_id] = media_session
-        else:
-            LOGGER.debug(f"Using cached media session for DC {file_id.dc_id}")
-        return media_session
+                # The stream itself is still admitted; keep counting it.
+                slots[member[0]] = slot
+        return remaining
+
+    async def read_part(self, file_id: FileId, offset: int, limit: int) -> bytes:
+        base = offset - offset % CHUNK_SIZE
+        if header_cache.has(file_id.unique_id, base):
+            chunk = await header_cache.get(file_id.unique_id, base)
+            if chunk is not None:
+                return chunk[offset - base:offset - base + limit]
+        if limit == CHUNK_SIZE:
+            return await chunk_cache.get_or_fetch(
+                (file_id.media_id, offset), partial(self.read_chunk, file_id, offset, limit)
+            )
+        cached = chunk_cache.get((file_id.media_id, base))
+        if cached is not None:
+            return cached[offset - base:offset - base + limit]
+        return await self.read_chunk(file_id, offset, limit)
+
+    async def read_chunk(self, file_id: FileId, offset: int, limit: int) -> bytes:
+        base = offset - offset % CHUNK_SIZE
+        chunk = await disk_cache.get(file_id.media_id, base)
+        if chunk is not None:
+            return chunk[offset - base:offset - base + limit]
+        try:
+            chunk = await self.timed_fetch(file_id, offset, limit)
+        except FileReferenceExpired:
+            await self.refresh_file_reference(file_id)
+            chunk = await self.timed_fetch(file_id, offset, limit)
+        if limit == CHUNK_SIZE:
+            disk_cache.store(file_id.media_id, offset, chunk)
+        return chunk
+
+    async def timed_fetch(self, file_id: FileId, offset: int, limit: int) -> bytes:
+        pool = get_media_pool(self.client, file_id.dc_id)
+        location = await self.get_location(file_id)
+        for attempt in range(2):
+            media_session = await pool.acquire()
+            started = monotonic()
+            try:
+                chunk = await self.fetch_chunk(media_session, location, offset, limit)
+            except FloodWait as e:
+                scheduler.record_flood(self.index, e.value)
+                metrics.getfile_errors.inc(self.index, file_id.dc_id, "flood_wait")
+                raise
+            except FileReferenceExpired:
+                metrics.getfile_errors.inc(self.index, file_id.dc_id, "file_reference_expired")
+                raise
+            except (TimeoutError, RPCError) as e:
+                scheduler.record_error(self.index, file_id.dc_id)
+                metrics.getfile_errors.inc(self.index, file_id.dc_id, "timeout" if isinstance(e, TimeoutError) else "rpc")
+                raise
+            except OSError:
+                scheduler.record_error(self.index, file_id.dc_id)
+                metrics.getfile_errors.inc(self.index, file_id.dc_id, "connection")
+                # The connection is gone; retry once on a fresh session.
+                pool.discard(media_session)
+                if attempt:
+                    raise
+                continue
+            finally:
+                pool.release(media_session)
+            elapsed = monotonic() - started
+            scheduler.record(self.index, file_id.dc_id, len(chunk), elapsed)
+            metrics.getfile_latency.observe(elapsed, self.index, file_id.dc_id)
+            return chunk
 
+    @staticmethod
+    async def fetch_chunk(media_session: Session, location, offset: int, limit: int) -> bytes:
+        r = await media_session.send(
+            raw.functions.upload.GetFile(location=location, offset=offset, limit=limit)
+        )
+        if isinstance(r, raw.types.upload.File):
+            return r.bytes
+        return b""
 
     @staticmethod
     async def get_location(file_id: FileId) -> Union[raw.types.InputPhotoFileLocation, raw.types.InputDocumentFileLocation, raw.types.InputPeerPhotoFileLocation]:
@@ -139,8 +435,18 @@ class ByteStreamer:
                                                            thumb_size=file_id.thumbnail_size)
         return location
 
-    async def clean_cache(self) -> None:
-        while True:
-            await asyncio.sleep(self.clean_timer)
-            self.__cached_file_ids.clear()
-            LOGGER.debug("Cleaned the cache")
+
+# Idle streamers (and their file id caches) are dropped after an hour.
+streamers = AsyncTTLCache("streamers", 256, 3600, sliding=True)
+
+
+def get_streamer(index: int) -> ByteStreamer:
+    client = multi_clients[index]
+    tg_connect = streamers.get(client)
+    if not tg_connect:
+        tg_connect = ByteStreamer(client, index)
+        streamers.set(client, tg_connect)
+    return tg_connect
+
+
+metrics.bot_workload.set_function(lambda: {(index,): load for index, load in work_loads.items()})
@@ -1,19 +1,94 @@
-from asyncio import create_task
-from bson import ObjectId
+import heapq
+from asyncio import create_task, gather, sleep
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bson import ObjectId, json_util
 import motor.motor_asyncio
 from datetime import datetime
+from time import monotonic
 from pydantic import ValidationError
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, DeleteOne, IndexModel, UpdateOne, monitoring
 from typing import Dict, List, Optional, Tuple, Any
 
 from Backend.logger import LOGGER
 from Backend.config import Telegram
 import re
 from Backend.helper.encrypt import decode_string, encode_string
+from Backend.helper import metrics
+from Backend.helper.cache import AsyncTTLCache
+from Backend.helper.search_index import RESULT_FIELDS, search_index
 from Backend.helper.modal import Episode, MovieSchema, QualityDetail, Season, TVShowSchema
 from Backend.helper.task_manager import delete_message
 
 
+CATALOG_SORTS = ("updated_on", "rating")
+
+# Every storage shard gets these, keyed by collection. Catalog pages sort by
+# (field, _id), optionally filtered by one genre.
+STORAGE_INDEXES = {
+    collection_name: [
+        IndexModel([("tmdb_id", ASCENDING)], name="tmdb_id"),
+        IndexModel([("title", ASCENDING), ("release_year", ASCENDING)], name="title_release_year"),
+        *[
+            IndexModel([(field, DESCENDING), ("_id", DESCENDING)], name=f"catalog_{field}")
+            for field in CATALOG_SORTS
+        ],
+        *[
+            IndexModel([("genres", ASCENDING), (field, DESCENDING), ("_id", DESCENDING)], name=f"catalog_genre_{field}")
+            for field in CATALOG_SORTS
+        ],
+    ]
+    for collection_name in ("movie", "tv")
+}
+STORAGE_INDEXES["tv"].append(IndexModel([("seasons.episodes.telegram.id", ASCENDING)], name="episode_file"))
+
+TRACKING_INDEXES = {
+    "counters": [
+        IndexModel([("media_type", ASCENDING), ("genre", ASCENDING)], name="media_type_genre"),
+        IndexModel([("media_type", ASCENDING), ("shard", ASCENDING)], name="media_type_shard"),
+    ],
+    "files": [IndexModel([("dc_id", ASCENDING)], name="dc_id")],
+}
+
+# (name, collection, filter, sort) for the queries run on every request or
+# ingest; the values only have to have the right types for explain.
+HOT_QUERIES = [
+    *[
+        (f"{collection_name}.{name}", collection_name, query, sort)
+        for collection_name in ("movie", "tv")
+        for name, query, sort in [
+            ("tmdb_id", {"tmdb_id": 0}, None),
+            ("title_release_year", {"title": "", "release_year": 0}, None),
+            *[(f"catalog_{field}", {}, [(field, DESCENDING), ("_id", DESCENDING)]) for field in CATALOG_SORTS],
+            *[
+                (f"catalog_genre_{field}", {"genres": {"$in": [""]}}, [(field, DESCENDING), ("_id", DESCENDING)])
+                for field in CATALOG_SORTS
+            ],
+        ]
+    ],
+    ("tv.episode_file", "tv", {"seasons.episodes.telegram.id": ""}, None),
+]
+
+# A mid-catalog keyset position per sort field, for explaining the queries
+# every page after the first runs (see _after_position).
+KEYSET_SAMPLES = {"updated_on": datetime(2000, 1, 1), "rating": 5.0}
+
+TRACKING_QUERIES = [
+    ("counters.media_type_genre", "counters", {"media_type": "movie", "genre": "*"}, None),
+    ("counters.media_type_shard", "counters", {"media_type": "movie", "shard": 1}, None),
+]
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten an explain plan tree into its stages."""
+    stages = []
+    while plan:
+        stages.append(plan)
+        for child in plan.get("inputStages", []):
+            stages.extend(_plan_stages(child))
+        plan = plan.get("inputStage")
+    return stages
+
+
 def convert_objectid_to_str(document: Dict[str, Any]) -> Dict[str, Any]:
     for key, value in document.items():
         if isinstance(value, ObjectId):
@@ -25,6 +100,111 @@ def convert_objectid_to_str(document: Dict[str, Any]) -> Dict[str, Any]:
     return document
 
 
+def encode_cursor(position: Dict[str, Any]) -> str:
+    return urlsafe_b64encode(json_util.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        return json_util.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def _telegram_qualities(collection_name: str, document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if collection_name == "movie":
+        return list(document.get("telegram") or [])
+    return [
+        quality
+        for season in document.get("seasons") or []
+        for episode in season.get("episodes") or []
+        for quality in episode.get("telegram") or []
+    ]
+
+
+# Mongo sorts values of different BSON types by bracket: missing/null first,
+# then these, in order. Each bracket's $type alias selects it in a filter;
+# $lt/$gt only ever match values of the same bracket.
+SORT_BRACKETS = (
+    ("number", (int, float)),
+    ("string", str),
+    ("objectId", ObjectId),
+    ("bool", bool),
+    ("date", datetime),
+)
+
+
+def _sort_bracket(value: Any) -> int:
+    if value is None:
+        return 0
+    for rank, (_, types) in enumerate(SORT_BRACKETS, 1):
+        # bool is an int subclass but has its own bracket.
+        if isinstance(value, types) and (types is bool or not isinstance(value, bool)):
+            return rank
+    return len(SORT_BRACKETS) + 1
+
+
+def _merge_key(doc: Dict[str, Any], field: str, db_index: int) -> Tuple:
+    value = doc.get(field)
+    bracket = _sort_bracket(value)
+    if bracket == 0 or bracket > len(SORT_BRACKETS):
+        value = 0 if value is None else repr(value)
+    return (bracket, value, db_index, doc["_id"])
+
+
+SEARCH_BUILD_BACKOFF = 5
+MAX_SEARCH_BUILD_BACKOFF = 300
+
+# Sort keys fetched per shard and round trip when seeking to a page offset.
+SEEK_BATCH = 2000
+
+
+def _position(field: str, direction: int, db_index: int, doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {"f": field, "d": direction, "v": doc.get(field), "s": db_index, "i": doc["_id"]}
+
+
+def _after_position(field: str, direction: int, position: Dict[str, Any], db_index: int) -> dict:
+    """Filter for documents of shard `db_index` that come after `position` in
+    the global (field, shard, _id) order."""
+    value, last_shard, last_id = position["v"], position["s"], position["i"]
+    descending = direction == DESCENDING
+    bracket = _sort_bracket(value)
+    clauses = []
+    if value is not None:
+        clauses.append({field: {"$lt" if descending else "$gt": value}})
+    later = [
+        alias for rank, (alias, _) in enumerate(SORT_BRACKETS, 1)
+        if (rank < bracket if descending else rank > bracket)
+    ]
+    if later:
+        clauses.append({field: {"$type": later}})
+    if descending and value is not None:
+        clauses.append({field: None})
+
+    if db_index == last_shard:
+        clauses.append({field: value, "_id": {"$lt" if descending else "$gt": last_id}})
+    elif (db_index < last_shard) if descending else (db_index > last_shard):
+        clauses.append({field: value})
+    return {"$or": clauses} if clauses else {"_id": {"$exists": False}}
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Feeds per-shard MongoDB command latency into the metrics registry."""
+
+    def __init__(self, shard: str):
+        self.shard = shard
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        metrics.mongo_latency.observe(event.duration_micros / 1e6, self.shard, event.command_name)
+
+    def failed(self, event):
+        metrics.mongo_latency.observe(event.duration_micros / 1e6, self.shard, event.command_name)
+        metrics.mongo_errors.inc(self.shard, event.command_name)
+
+
 class Database:
     def __init__(self, db_name: str = "dbFyvio"):
         self.db_uris = Telegram.DATABASE
@@ -37,12 +217,22 @@ class Database:
         self.dbs: Dict[str, motor.motor_asyncio.AsyncIOMotorDatabase] = {}
 
         self.current_db_index = 1
+        self._counts = AsyncTTLCache("catalog_counts", 256, 60)
+        # Keyset positions by (collection, sort, filter, offset), so a page
+        # number or Stremio skip resumes from the nearest known position.
+        self._positions = AsyncTTLCache("catalog_positions", 4096, 600)
+        # Bumped on every write to a collection; cached counts and positions
+        # are keyed by it, so a write invalidates them all at once.
+        self._generations: Dict[str, int] = {"movie": 0, "tv": 0}
+        # Document counts are read from the tracking "counters" collection
+        # once it has been reconciled against the shards.
+        self._counters_ready = False
 
     async def connect(self):
         try:
             for index, uri in enumerate(self.db_uris):
-                client = motor.motor_asyncio.AsyncIOMotorClient(uri)
                 db_key = "tracking" if index == 0 else f"storage_{index}"
+                client = motor.motor_asyncio.AsyncIOMotorClient(uri, event_listeners=[CommandTimer(db_key)])
                 self.clients[db_key] = client
                 self.dbs[db_key] = client[self.db_name]
                 db_type = "Tracking" if index == 0 else f"Storage {index}"
@@ -60,10 +250,67 @@ class Database:
                 self.current_db_index = state["current_index"]
 
             LOGGER.info(f"Active storage DB: storage_{self.current_db_index}")
+            await self.ensure_indexes()
 
         except Exception as e:
             LOGGER.error(f"Database connection error: {e}")
 
+    async def ensure_indexes(self):
+        """Create the query indexes on every database; existing ones are left as they are."""
+        for db_key, database in self.dbs.items():
+            specs = TRACKING_INDEXES if db_key == "tracking" else STORAGE_INDEXES
+            for collection_name, indexes in specs.items():
+                try:
+                    await database[collection_name].create_indexes(indexes)
+                except Exception as e:
+                    LOGGER.error(f"Failed to create indexes on {db_key}.{collection_name}: {e}")
+        LOGGER.info(f"Indexes ready on {len(self.dbs)} database(s)")
+
+    async def _explain(
+        self, db_key: str, name: str, collection_name: str, query: dict, sort: Optional[List[Tuple[str, int]]]
+    ) -> Dict[str, Any]:
+        cursor = self.dbs[db_key][collection_name].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = await cursor.explain()
+        except Exception as e:
+            return {"database": db_key, "query": name, "error": str(e)}
+        winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning.get("queryPlan", winning))
+        names = [stage.get("stage") for stage in stages]
+        return {
+            "database": db_key,
+            "query": name,
+            "stages": names,
+            "indexes": [stage["indexName"] for stage in stages if stage.get("indexName")],
+            "docs_examined": explain.get("executionStats", {}).get("totalDocsExamined"),
+            "indexed": "COLLSCAN" not in names and "SORT" not in names,
+        }
+
+    async def index_report(self) -> List[Dict[str, Any]]:
+        """Explain each hot query on every database and flag the ones that
+        scan a collection or sort in memory."""
+        report = [
+            await self._explain("tracking", name, collection_name, query, sort)
+            for name, collection_name, query, sort in TRACKING_QUERIES
+        ]
+        for db_index in range(1, len(self.dbs)):
+            db_key = f"storage_{db_index}"
+            queries = list(HOT_QUERIES)
+            for collection_name in ("movie", "tv"):
+                for field, sample in KEYSET_SAMPLES.items():
+                    sort = [(field, DESCENDING), ("_id", DESCENDING)]
+                    after = _after_position(field, DESCENDING, {"v": sample, "s": 1, "i": ObjectId()}, db_index)
+                    queries.append((f"{collection_name}.keyset_{field}", collection_name, after, sort))
+                    queries.append((
+                        f"{collection_name}.keyset_genre_{field}", collection_name,
+                        {"$and": [{"genres": {"$in": [""]}}, after]}, sort,
+                    ))
+            for name, collection_name, query, sort in queries:
+                report.append(await self._explain(db_key, name, collection_name, query, sort))
+        return report
+
     async def disconnect(self):
         for client in self.clients.values():
             client.close()
@@ -86,63 +333,278 @@ class Database:
             return {sort_field: DESCENDING if sort_direction.lower() == "desc" else ASCENDING}
         return {"updated_on": DESCENDING}
 
+    def _invalidate(self, collection_name: str) -> None:
+        self._generations[collection_name] += 1
+
+    async def _bump_counts(
+        self, db_index: int, collection_name: str, genres: Optional[List[str]], delta: int, total: bool = True
+    ) -> None:
+        keys = set(genres or [])
+        if total:
+            keys.add("*")
+        if not keys or not delta:
+            return
+        try:
+            await self.dbs["tracking"]["counters"].bulk_write([
+                UpdateOne(
+                    {"_id": f"{collection_name}:{db_index}:{genre}"},
+                    {
+                        "$inc": {"count": delta, "seq": 1},
+                        "$setOnInsert": {"media_type": collection_name, "shard": db_index, "genre": genre},
+                    },
+                    upsert=True,
+                )
+                for genre in keys
+            ], ordered=False)
+        except Exception as e:
+            # The next reconciliation corrects whatever was missed here.
+            LOGGER.warning(f"Failed to update {collection_name} counters for storage_{db_index}: {e}")
+
+    async def _bump_genre_diff(
+        self, db_index: int, collection_name: str, old_genres: Optional[List[str]], new_genres: Optional[List[str]]
+    ) -> None:
+        old_genres, new_genres = set(old_genres or []), set(new_genres or [])
+        await self._bump_counts(db_index, collection_name, list(old_genres - new_genres), -1, total=False)
+        await self._bump_counts(db_index, collection_name, list(new_genres - old_genres), 1, total=False)
+
+    async def get_counts(self, collection_name: str, genre: Optional[str] = None) -> Dict[int, int]:
+        """Document count per shard, from the counters collection."""
+        counters = await self.dbs["tracking"]["counters"].find(
+            {"media_type": collection_name, "genre": genre or "*"}, {"shard": 1, "count": 1}
+        ).to_list(None)
+        return {counter["shard"]: max(0, counter["count"]) for counter in counters}
+
+    async def _shard_counters(self, db_index: int, collection_name: str) -> Dict[str, int]:
+        collection = self.dbs[f"storage_{db_index}"][collection_name]
+        total, genres = await gather(
+            collection.count_documents({}),
+            collection.aggregate([
+                {"$project": {"genres": {"$setUnion": [{"$ifNull": ["$genres", []]}, []]}}},
+                {"$unwind": "$genres"},
+                {"$group": {"_id": "$genres", "count": {"$sum": 1}}},
+            ]).to_list(None),
+        )
+        counts = {row["_id"]: row["count"] for row in genres if isinstance(row["_id"], str)}
+        counts["*"] = total
+        return counts
+
+    async def reconcile_counters(self) -> int:
+        """Recount every shard and correct the counters; returns how many
+        counters had drifted.
+
+        Counters are snapshotted before counting, and a correction only
+        applies while the counter's `seq` (bumped by every $inc) is unchanged,
+        so writes racing the recount are never overwritten.
+        """
+        counters = self.dbs["tracking"]["counters"]
+        drifted = 0
+        for db_index in range(1, len(self.dbs)):
+            for collection_name in ("movie", "tv"):
+                stored = {
+                    counter["genre"]: counter
+                    for counter in await counters.find({"media_type": collection_name, "shard": db_index}).to_list(None)
+                }
+                actual = await self._shard_counters(db_index, collection_name)
+                operations = []
+                for genre, count in actual.items():
+                    counter = stored.get(genre)
+                    if counter is None:
+                        operations.append(UpdateOne(
+                            {"_id": f"{collection_name}:{db_index}:{genre}"},
+                            {"$setOnInsert": {
+                                "media_type": collection_name, "shard": db_index, "genre": genre, "count": count,
+                            }},
+                            upsert=True,
+                        ))
+                    elif counter["count"] != count:
+                        operations.append(UpdateOne(
+                            {"_id": counter["_id"], "seq": counter.get("seq")}, {"$set": {"count": count}}
+                        ))
+                operations.extend(
+                    DeleteOne({"_id": counter["_id"], "seq": counter.get("seq")})
+                    for genre, counter in stored.items() if genre not in actual
+                )
+                drifted += len(operations)
+                if operations:
+                    await counters.bulk_write(operations, ordered=False)
+        self._counters_ready = True
+        return drifted
+
+    async def reconcile_counters_periodically(self):
+        while True:
+            try:
+                drifted = await self.reconcile_counters()
+                if drifted:
+                    LOGGER.info(f"Reconciled {drifted} drifted document counter(s)")
+            except Exception as e:
+                LOGGER.error(f"Document counter reconciliation failed: {e}")
+            await sleep(Telegram.COUNTER_RECONCILE_INTERVAL)
+
+    async def build_search_index(self):
+        """Load every shard into the in-memory search index, retrying with
+        backoff until it succeeds. Writes made meanwhile are applied directly
+        and take precedence."""
+        projections = {
+            "movie": {**{field: 1 for field in RESULT_FIELDS}, "telegram.name": 1},
+            "tv": {**{field: 1 for field in RESULT_FIELDS}, "seasons.episodes.telegram.name": 1},
+        }
+        delay = SEARCH_BUILD_BACKOFF
+        while True:
+            started = monotonic()
+            search_index.begin_build()
+            try:
+                for db_index in range(1, len(self.dbs)):
+                    for collection_name, projection in projections.items():
+                        async for document in self.dbs[f"storage_{db_index}"][collection_name].find({}, projection):
+                            document["db_index"] = db_index
+                            search_index.load(collection_name, document)
+            except Exception as e:
+                search_index.abort_build()
+                LOGGER.error(f"Failed to build the search index, retrying in {delay:.0f}s: {e}")
+                await sleep(delay)
+                delay = min(delay * 2, MAX_SEARCH_BUILD_BACKOFF)
+                continue
+            search_index.finish_build()
+            LOGGER.info(f"Search index built with {search_index.stats()['documents']} titles in {monotonic() - started:.2f}s")
+            return
+
+    async def _count_documents(self, collection_name: str, filter_dict: dict) -> int:
+        if self._counters_ready and set(filter_dict) <= {"genres"}:
+            genres = filter_dict.get("genres", {"$in": [None]})
+            if isinstance(genres, dict) and list(genres) == ["$in"] and len(genres["$in"]) == 1:
+                counts = await self.get_counts(collection_name, genres["$in"][0])
+                return sum(count for db_index, count in counts.items() if db_index <= self.current_db_index)
+
+        async def count():
+            counts = await gather(*[
+                self.dbs[f"storage_{i}"][collection_name].count_documents(filter_dict)
+                for i in range(1, self.current_db_index + 1)
+            ])
+            return sum(counts)
+        key = (
+            collection_name, self._generations[collection_name],
+            json_util.dumps(filter_dict, sort_keys=True), self.current_db_index,
+        )
+        return await self._counts.get_or_load(key, count)
+
+    async def _merge_page(
+        self,
+        collection_name: str,
+        field: str,
+        direction: int,
+        page_size: int,
+        filter_dict: dict,
+        position: Optional[Dict[str, Any]],
+        projection: Optional[dict] = None,
+    ) -> Tuple[List[Tuple[int, dict]], Optional[Dict[str, Any]]]:
+        """One page of the global order: the first `page_size` documents after
+        `position` on every shard, k-way merged."""
+        shards = list(range(1, self.current_db_index + 1))
+
+        async def fetch(db_index: int) -> List[Tuple[int, dict]]:
+            query = filter_dict
+            if position is not None:
+                after = _after_position(field, direction, position, db_index)
+                query = {"$and": [filter_dict, after]} if filter_dict else after
+            docs = await (
+                self.dbs[f"storage_{db_index}"][collection_name]
+                .find(query, projection)
+                .sort([(field, direction), ("_id", direction)])
+                .limit(page_size)
+                .to_list(page_size)
+            )
+            return [(db_index, doc) for doc in docs]
+
+        per_shard = await gather(*[fetch(db_index) for db_index in shards])
+        merged = heapq.merge(
+            *per_shard,
+            key=lambda item: _merge_key(item[1], field, item[0]),
+            reverse=direction == DESCENDING,
+        )
+        page = [item for _, item in zip(range(page_size), merged)]
+        if len(page) < page_size:
+            return page, None
+        db_index, last = page[-1]
+        return page, _position(field, direction, db_index, last)
+
+    async def _seek(
+        self, position_key: Tuple, page_size: int, filter_dict: dict, offset: int
+    ) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Keyset position of the `offset`-th document, walking forward from
+        the nearest cached position at or before it. Returns (False, None)
+        when the collection ends first.
+
+        The walk fetches sort keys only, SEEK_BATCH documents per shard and
+        round trip, and caches every page boundary it passes.
+        """
+        collection_name, _, field, direction, _ = position_key
+        start, position = 0, None
+        for candidate in range(offset, 0, -page_size):
+            cached = self._positions.peek(position_key + (candidate,))
+            if cached is not None:
+                start, position = candidate, cached
+                break
+        while start < offset:
+            hop = min(SEEK_BATCH, offset - start)
+            items, position = await self._merge_page(
+                collection_name, field, direction, hop, filter_dict, position, projection={field: 1}
+            )
+            if position is None:
+                return False, None
+            for seen, (db_index, doc) in enumerate(items, start + 1):
+                if seen % page_size == 0:
+                    self._positions.set(position_key + (seen,), _position(field, direction, db_index, doc))
+            start += hop
+            self._positions.set(position_key + (start,), position)
+        return True, position
+
     async def _paginate_collection(
         self,
         collection_name: str,
         sort_dict: Dict[str, int],
         page: int,
         page_size: int,
-        filter_dict: Optional[dict] = None
+        filter_dict: Optional[dict] = None,
+        cursor: Optional[str] = None,
     ):
-        filter_dict = filter_dict or {}
-        skip = (page - 1) * page_size
-        results = []
-        dbs_checked = []
-        total_count = 0
-
-        db_counts = []
-        for i in range(1, self.current_db_index + 1):
-            db_key = f"storage_{i}"
-            db = self.dbs[db_key]
-            count = await db[collection_name].count_documents(filter_dict)
-            db_counts.append((i, count))
-            total_count += count
-
-        start_db_index = None
-        for db_index, count in reversed(db_counts):
-            if skip < count:
-                start_db_index = db_index
-                break
-            skip -= count
-
-        if not start_db_index:
-            return [], [], total_count
+        """Globally sorted page across all storage shards.
 
-        for db_index, count in reversed(db_counts):
-            if db_index < start_db_index:
-                continue
-
-            db_key = f"storage_{db_index}"
-            db = self.dbs[db_key]
-            dbs_checked.append(db_index)
-
-            cursor = (
-                db[collection_name]
-                .find(filter_dict)
-                .sort(sort_dict)
-                .skip(skip if db_index == start_db_index else 0)
-                .limit(page_size - len(results))
-            )
+        With a continuation `cursor` (returned as `next_cursor`) a page costs
+        one keyset query per shard. A page number is resolved to a keyset
+        position through the position cache, so sequential scrolling also
+        costs one hop per page.
+        """
+        filter_dict = filter_dict or {}
+        field, direction = next(iter(sort_dict.items()))
+        position_key = (
+            collection_name, self._generations[collection_name], field, direction,
+            json_util.dumps(filter_dict, sort_keys=True),
+        )
 
-            docs = await cursor.to_list(None)
-            results.extend(docs)
+        total_count = await self._count_documents(collection_name, filter_dict)
+        offset = None
+        if cursor:
+            position = decode_cursor(cursor)
+            if position.get("f") != field or position.get("d") != direction:
+                raise ValueError("Cursor does not match the requested sort")
+        else:
+            offset = (page - 1) * page_size
+            found, position = await self._seek(position_key, page_size, filter_dict, offset)
+            if not found:
+                return [], [], total_count, None
 
-            if len(results) >= page_size:
-                break
-        return results, dbs_checked, total_count
+        items, next_position = await self._merge_page(
+            collection_name, field, direction, page_size, filter_dict, position
+        )
+        if offset is not None and next_position:
+            self._positions.set(position_key + (offset + page_size,), next_position)
+        results = [doc for _, doc in items]
+        dbs_checked = sorted({db_index for db_index, _ in items})
+        next_cursor = encode_cursor(next_position) if next_position else None
+        return results, dbs_checked, total_count, next_cursor
 
     async def _move_document(
-        self, collection_name: str, document: dict, old_db_index: int
+        self, collection_name: str, document: dict, old_db_index: int, old_genres: Optional[List[str]] = None
     ) -> bool:
         current_db_key = f"storage_{self.current_db_index}"
         old_db_key = f"storage_{old_db_index}"
@@ -150,6 +612,11 @@ class Database:
         try:
             await self.dbs[current_db_key][collection_name].insert_one(document)
             await self.dbs[old_db_key][collection_name].delete_one({"_id": document["_id"]})
+            counted_genres = document.get("genres") if old_genres is None else old_genres
+            await self._bump_counts(old_db_index, collection_name, counted_genres, -1)
+            await self._bump_counts(self.current_db_index, collection_name, document.get("genres"), 1)
+            self._invalidate(collection_name)
+            search_index.add(collection_name, document)
             LOGGER.info(f"✅ Moved document {document.get('tmdb_id')} from {old_db_key} to {current_db_key}")
             return True
         except Exception as e:
@@ -266,6 +733,9 @@ class Database:
             try:
                 movie_dict["db_index"] = self.current_db_index
                 result = await self.dbs[current_db_key]["movie"].insert_one(movie_dict)
+                await self._bump_counts(self.current_db_index, "movie", movie_dict.get("genres"), 1)
+                self._invalidate("movie")
+                search_index.add("movie", movie_dict)
                 return result.inserted_id
             except Exception as e:
                 LOGGER.error(f"Insertion failed in {current_db_key}: {e}")
@@ -274,6 +744,7 @@ class Database:
                 return None
 
         movie_id = existing_movie["_id"]
+        existing_genres = list(existing_movie.get("genres") or [])
         existing_qualities = existing_movie.get("telegram", [])
         matching_quality = next((q for q in existing_qualities if q["quality"] == target_quality), None)
         if matching_quality:
@@ -285,6 +756,7 @@ class Database:
                     chat_id = int(f"-100{decoded_data['chat_id']}")
                     msg_id = int(decoded_data['msg_id'])
                     create_task(delete_message(chat_id, msg_id))
+                    await self.dbs["tracking"]["files"].delete_one({"_id": f"{chat_id}:{msg_id}"})
             except Exception as e:
                 LOGGER.error(f"Failed to queue old quality file for deletion: {e}")
 
@@ -296,7 +768,7 @@ class Database:
 
         if existing_db_index != self.current_db_index:
             try:
-                if await self._move_document("movie", existing_movie, existing_db_index):
+                if await self._move_document("movie", existing_movie, existing_db_index, existing_genres):
                     return movie_id
             except Exception as e:
                 LOGGER.error(f"Error moving movie to {current_db_key}: {e}")
@@ -305,6 +777,9 @@ class Database:
 
         try:
             await self.dbs[existing_db_key]["movie"].replace_one({"_id": movie_id}, existing_movie)
+            await self._bump_genre_diff(existing_db_index, "movie", existing_genres, existing_movie.get("genres"))
+            self._invalidate("movie")
+            search_index.add("movie", existing_movie)
             return movie_id
         except Exception as e:
             LOGGER.error(f"Failed to update movie {tmdb_id} in {existing_db_key}: {e}")
@@ -345,6 +820,9 @@ class Database:
             try:
                 tv_show_dict["db_index"] = self.current_db_index
                 result = await self.dbs[current_db_key]["tv"].insert_one(tv_show_dict)
+                await self._bump_counts(self.current_db_index, "tv", tv_show_dict.get("genres"), 1)
+                self._invalidate("tv")
+                search_index.add("tv", tv_show_dict)
                 return result.inserted_id
             except Exception as e:
                 LOGGER.error(f"Insertion failed in {current_db_key}: {e}")
@@ -353,6 +831,7 @@ class Database:
                 return None
 
         tv_id = existing_tv["_id"]
+        existing_genres = list(existing_tv.get("genres") or [])
         for season in tv_show_dict["seasons"]:
             existing_season = next(
                 (s for s in existing_tv["seasons"] if s["season_number"] == season["season_number"]), None
@@ -380,7 +859,8 @@ class Database:
                                         chat_id = int(f"-100{decoded_data['chat_id']}")
                                         msg_id = int(decoded_data['msg_id'])
                                         create_task(delete_message(chat_id, msg_id))
-                                        
+                                        await self.dbs["tracking"]["files"].delete_one({"_id": f"{chat_id}:{msg_id}"})
+
                                 except Exception as e:
                                     LOGGER.error(f"Failed to queue old quality file for deletion: {e}")
                                 existing_quality.update(quality)
@@ -394,7 +874,7 @@ class Database:
 
         if existing_db_index != self.current_db_index:
             try:
-                if await self._move_document("tv", existing_tv, existing_db_index):
+                if await self._move_document("tv", existing_tv, existing_db_index, existing_genres):
                     return tv_id
             except Exception as e:
                 LOGGER.error(f"Error moving TV show to {current_db_key}: {e}")
@@ -404,17 +884,20 @@ class Database:
 
         try:
             await self.dbs[existing_db_key]["tv"].replace_one({"_id": tv_id}, existing_tv)
+            await self._bump_genre_diff(existing_db_index, "tv", existing_genres, existing_tv.get("genres"))
+            self._invalidate("tv")
+            search_index.add("tv", existing_tv)
             return tv_id
         except Exception as e:
             LOGGER.error(f"Failed to update TV show {tmdb_id} in {existing_db_key}: {e}")
             if any(keyword in str(e).lower() for keyword in ["storage", "quota"]):
                 return await self._handle_storage_error(self.update_tv_show, tv_show_data, total_storage_dbs=total_storage_dbs)
     
-    async def sort_movies(self, sort_params, page, page_size, genre_filter=None):
+    async def sort_movies(self, sort_params, page, page_size, genre_filter=None, cursor=None):
         sort_dict = self._get_sort_dict(sort_params)
         filter_dict = {"genres": {"$in": [genre_filter]}} if genre_filter else {}
-        results, dbs_checked, total_count = await self._paginate_collection(
-            "movie", sort_dict, page, page_size, filter_dict=filter_dict
+        results, dbs_checked, total_count, next_cursor = await self._paginate_collection(
+            "movie", sort_dict, page, page_size, filter_dict=filter_dict, cursor=cursor
         )
         total_pages = (total_count + page_size - 1) // page_size
         return {
@@ -422,14 +905,15 @@ class Database:
             "total_pages": total_pages,
             "databases_checked": dbs_checked,
             "current_page": page,
+            "next_cursor": next_cursor,
             "movies": [convert_objectid_to_str(result) for result in results],
         }
 
-    async def sort_tv_shows(self, sort_params, page, page_size, genre_filter=None):
+    async def sort_tv_shows(self, sort_params, page, page_size, genre_filter=None, cursor=None):
         sort_dict = self._get_sort_dict(sort_params)
         filter_dict = {"genres": {"$in": [genre_filter]}} if genre_filter else {}
-        results, dbs_checked, total_count = await self._paginate_collection(
-            "tv", sort_dict, page, page_size, filter_dict=filter_dict
+        results, dbs_checked, total_count, next_cursor = await self._paginate_collection(
+            "tv", sort_dict, page, page_size, filter_dict=filter_dict, cursor=cursor
         )
         total_pages = (total_count + page_size - 1) // page_size
         return {
@@ -437,6 +921,7 @@ class Database:
             "total_pages": total_pages,
             "databases_checked": dbs_checked,
             "current_page": page,
+            "next_cursor": next_cursor,
             "tv_shows": [convert_objectid_to_str(result) for result in results],
         }
 
@@ -446,10 +931,14 @@ class Database:
             self, 
             query: str, 
             page: int, 
-            page_size: int
+            page_size: int,
+            media_type: Optional[str] = None
         ) -> dict:
 
             skip = (page - 1) * page_size
+            if search_index.ready:
+                total_count, results = search_index.search(query, media_type, skip, page_size)
+                return {"total_count": total_count, "results": results}
             
             words = query.split()
             regex_query = {
@@ -481,6 +970,16 @@ class Database:
                 }}
             ]
             
+            pipelines = {"tv": tv_pipeline, "movie": movie_pipeline}
+            name_fields = {"tv": "seasons.episodes.telegram.name", "movie": "telegram.name"}
+            wanted = [media_type] if media_type else ["tv", "movie"]
+
+            async def matches(db) -> List[dict]:
+                found = []
+                for collection_name in wanted:
+                    found.extend(await db[collection_name].aggregate(pipelines[collection_name]).to_list(None))
+                return found
+
             results = []
             dbs_checked = []
             
@@ -488,20 +987,13 @@ class Database:
             active_db = self.dbs[active_db_key]
             dbs_checked.append(self.current_db_index)
             
-            tv_results = await active_db["tv"].aggregate(tv_pipeline).to_list(None)
-            movie_results = await active_db["movie"].aggregate(movie_pipeline).to_list(None)
-            combined = tv_results + movie_results
-            results.extend(combined)
+            results.extend(await matches(active_db))
             
             if len(results) < page_size:
                 previous_db_index = self.current_db_index - 1
                 while previous_db_index > 0 and len(results) < page_size:
                     prev_db_key = f"storage_{previous_db_index}"
-                    prev_db = self.dbs[prev_db_key]
-                    tv_results_prev = await prev_db["tv"].aggregate(tv_pipeline).to_list(None)
-                    movie_results_prev = await prev_db["movie"].aggregate(movie_pipeline).to_list(None)
-                    combined_prev = tv_results_prev + movie_results_prev
-                    results.extend(combined_prev)
+                    results.extend(await matches(self.dbs[prev_db_key]))
                     dbs_checked.append(previous_db_index)
                     previous_db_index -= 1
 
@@ -509,19 +1001,13 @@ class Database:
             for db_index in dbs_checked:
                 key = f"storage_{db_index}"
                 db = self.dbs[key]
-                tv_count = await db["tv"].count_documents({
-                    "$or": [
-                        {"title": regex_query},
-                        {"seasons.episodes.telegram.name": regex_query}
-                    ]
-                })
-                movie_count = await db["movie"].count_documents({
-                    "$or": [
-                        {"title": regex_query},
-                        {"telegram.name": regex_query}
-                    ]
-                })
-                total_count += (tv_count + movie_count)
+                for collection_name in wanted:
+                    total_count += await db[collection_name].count_documents({
+                        "$or": [
+                            {"title": regex_query},
+                            {name_fields[collection_name]: regex_query}
+                        ]
+                    })
             
             paged_results = results[skip:skip + page_size]
 
@@ -584,6 +1070,66 @@ class Database:
             return None
 
 
+    async def find_episode_by_file(self, file_token: str) -> Optional[dict]:
+        """Locate the TV episode that a /dl token belongs to, across all shards."""
+        total_storage_dbs = len(self.dbs) - 1
+        for db_index in range(1, total_storage_dbs + 1):
+            tv_show = await self.dbs[f"storage_{db_index}"]["tv"].find_one(
+                {"seasons.episodes.telegram.id": file_token},
+                {"tmdb_id": 1, "seasons": 1}
+            )
+            if not tv_show:
+                continue
+            for season in tv_show.get("seasons", []):
+                for episode in season.get("episodes", []):
+                    for quality in episode.get("telegram", []):
+                        if quality.get("id") == file_token:
+                            return {
+                                "tmdb_id": tv_show["tmdb_id"],
+                                "db_index": db_index,
+                                "season_number": season.get("season_number"),
+                                "episode_number": episode.get("episode_number"),
+                                "quality": quality.get("quality", ""),
+                            }
+        return None
+
+
+    # -------------------------------
+    # Stored file info for the stream path
+    # -------------------------------
+
+    async def save_file_info(self, chat_id: int, msg_id: int, info: Dict[str, Any]) -> None:
+        await self.dbs["tracking"]["files"].update_one(
+            {"_id": f"{chat_id}:{msg_id}"},
+            {"$set": {**info, "chat_id": chat_id, "msg_id": msg_id}},
+            upsert=True
+        )
+
+    async def get_file_info(self, chat_id: int, msg_id: int) -> Optional[Dict[str, Any]]:
+        return await self.dbs["tracking"]["files"].find_one({"_id": f"{chat_id}:{msg_id}"})
+
+    async def get_file_dc_ids(self) -> List[int]:
+        return [dc_id for dc_id in await self.dbs["tracking"]["files"].distinct("dc_id") if dc_id]
+
+    async def set_file_id(self, chat_id: int, msg_id: int, bot_id: int, file_id: str) -> None:
+        await self.dbs["tracking"]["files"].update_one(
+            {"_id": f"{chat_id}:{msg_id}"},
+            {"$set": {f"file_ids.{bot_id}": file_id}}
+        )
+
+    async def delete_file_infos(self, qualities: List[Dict[str, Any]]) -> None:
+        """Drop the stored file info of telegram qualities removed from the catalog."""
+        keys = []
+        for quality in qualities:
+            try:
+                decoded_data = await decode_string(quality["id"])
+                keys.append(f"-100{decoded_data['chat_id']}:{int(decoded_data['msg_id'])}")
+            except Exception as e:
+                LOGGER.error(f"Failed to decode file token {quality.get('id')}: {e}")
+        if keys:
+            await self.dbs["tracking"]["files"].delete_many({"_id": {"$in": keys}})
+
+
     # -------------------------------
     # DB Method for Edit Post
     # -------------------------------
@@ -610,7 +1156,17 @@ class Database:
         collection = self.dbs[db_key][collection_name]
 
         try:
+            before = None
+            if "genres" in update_data:
+                before = await collection.find_one({"tmdb_id": int(tmdb_id)}, {"genres": 1})
             result = await collection.update_one({"tmdb_id": int(tmdb_id)}, {"$set": update_data})
+            if result.modified_count:
+                self._invalidate(collection_name)
+                updated = await collection.find_one({"tmdb_id": int(tmdb_id)})
+                if updated:
+                    search_index.add(collection_name, updated)
+            if before is not None and result.modified_count:
+                await self._bump_genre_diff(int(db_index), collection_name, before.get("genres"), update_data["genres"])
 
             return result.modified_count > 0
 
@@ -634,6 +1190,8 @@ class Database:
                         LOGGER.error(f"Document with tmdb_id {tmdb_id} not found in {db_key} during migration.")
                         return False
 
+                    old_genres = old_doc.get("genres")
+                    old_id = old_doc["_id"]
                     old_doc.update(update_data)
                     old_doc["db_index"] = next_db_index
                     old_doc.pop("_id", None)
@@ -641,6 +1199,11 @@ class Database:
                     LOGGER.info(f"Inserted document {insert_result.inserted_id} into {new_db_key}")
                     await self.dbs[db_key][collection_name].delete_one({"tmdb_id": int(tmdb_id)})
                     LOGGER.info(f"Deleted document tmdb_id {tmdb_id} from {db_key}")
+                    await self._bump_counts(db_index_int, collection_name, old_genres, -1)
+                    await self._bump_counts(next_db_index, collection_name, old_doc.get("genres"), 1)
+                    self._invalidate(collection_name)
+                    search_index.remove(collection_name, old_id)
+                    search_index.add(collection_name, old_doc)
                     self.current_db_index = next_db_index
                     await self.update_current_db_index()
                     LOGGER.info(f"Switched to {new_db_key} and document migrated successfully.")
@@ -654,11 +1217,15 @@ class Database:
     # Delete a Movie or Tvshow completely
     async def delete_document(self, media_type: str, tmdb_id: int, db_index: int) -> bool:
         db_key = f"storage_{db_index}"
-        if media_type == "Movie":
-            result = await self.dbs[db_key]["movie"].delete_one({"tmdb_id": tmdb_id})
-        else:
-            result = await self.dbs[db_key]["tv"].delete_one({"tmdb_id": tmdb_id})
-        if result.deleted_count > 0:
+        collection_name = "movie" if media_type == "Movie" else "tv"
+        deleted = await self.dbs[db_key][collection_name].find_one_and_delete(
+            {"tmdb_id": tmdb_id}, {"genres": 1, "telegram": 1, "seasons": 1}
+        )
+        if deleted:
+            await self._bump_counts(db_index, collection_name, deleted.get("genres"), -1)
+            await self.delete_file_infos(_telegram_qualities(collection_name, deleted))
+            self._invalidate(collection_name)
+            search_index.remove(collection_name, deleted["_id"])
             LOGGER.info(f"{media_type} with tmdb_id {tmdb_id} deleted successfully.")
             return True
         LOGGER.info(f"No document found with tmdb_id {tmdb_id}.")
@@ -671,12 +1238,15 @@ class Database:
         movie = await self.dbs[db_key]["movie"].find_one({"tmdb_id": tmdb_id})
         if not movie or "telegram" not in movie:
             return False
-        original_len = len(movie["telegram"])
+        removed = [q for q in movie["telegram"] if q.get("quality") == quality]
         movie["telegram"] = [q for q in movie["telegram"] if q.get("quality") != quality]
-        if len(movie["telegram"]) == original_len:
+        if not removed:
             return False  
         movie['updated_on'] = datetime.utcnow()
         result = await self.dbs[db_key]["movie"].replace_one({"tmdb_id": tmdb_id}, movie)
+        await self.delete_file_infos(removed)
+        self._invalidate("movie")
+        search_index.add("movie", movie)
         return result.modified_count > 0
 
     # Delete a specific episode from a TV show
@@ -685,17 +1255,19 @@ class Database:
         tv = await self.dbs[db_key]["tv"].find_one({"tmdb_id": tmdb_id})
         if not tv or "seasons" not in tv:
             return False
-        found = False
+        removed = []
         for season in tv["seasons"]:
             if season.get("season_number") == season_number:
-                original_len = len(season["episodes"])
+                removed = [ep for ep in season["episodes"] if ep.get("episode_number") == episode_number]
                 season["episodes"] = [ep for ep in season["episodes"] if ep.get("episode_number") != episode_number]
-                found = original_len > len(season["episodes"])
                 break
-        if not found:
+        if not removed:
             return False
         tv['updated_on'] = datetime.utcnow()
         result = await self.dbs[db_key]["tv"].replace_one({"tmdb_id": tmdb_id}, tv)
+        await self.delete_file_infos(_telegram_qualities("tv", {"seasons": [{"episodes": removed}]}))
+        self._invalidate("tv")
+        search_index.add("tv", tv)
         return result.modified_count > 0
 
     # Delete a whole season from a TV show
@@ -704,12 +1276,15 @@ class Database:
         tv = await self.dbs[db_key]["tv"].find_one({"tmdb_id": tmdb_id})
         if not tv or "seasons" not in tv:
             return False
-        original_len = len(tv["seasons"])
+        removed = [s for s in tv["seasons"] if s.get("season_number") == season_number]
         tv["seasons"] = [s for s in tv["seasons"] if s.get("season_number") != season_number]
-        if len(tv["seasons"]) == original_len:
+        if not removed:
             return False  
         tv['updated_on'] = datetime.utcnow()
         result = await self.dbs[db_key]["tv"].replace_one({"tmdb_id": tmdb_id}, tv)
+        await self.delete_file_infos(_telegram_qualities("tv", {"seasons": removed}))
+        self._invalidate("tv")
+        search_index.add("tv", tv)
         return result.modified_count > 0
 
     # Delete a specific quality from a given TV episode
@@ -718,29 +1293,35 @@ class Database:
         tv = await self.dbs[db_key]["tv"].find_one({"tmdb_id": tmdb_id})
         if not tv or "seasons" not in tv:
             return False
-        found = False
+        removed = []
         for season in tv["seasons"]:
             if season.get("season_number") == season_number:
                 for episode in season["episodes"]:
                     if episode.get("episode_number") == episode_number and "telegram" in episode:
-                        original_len = len(episode["telegram"])
+                        removed = [q for q in episode["telegram"] if q.get("quality") == quality]
                         episode["telegram"] = [q for q in episode["telegram"] if q.get("quality") != quality]
-                        found = original_len > len(episode["telegram"])
                         break
-        if not found:
+        if not removed:
             return False
         tv['updated_on'] = datetime.utcnow()
         result = await self.dbs[db_key]["tv"].replace_one({"tmdb_id": tmdb_id}, tv)
+        await self.delete_file_infos(removed)
+        self._invalidate("tv")
+        search_index.add("tv", tv)
         return result.modified_count > 0
 
     # Get per-DB statistics (movies, tv shows, used size, etc.)
     async def get_database_stats(self):
         stats = []
+        movie_counts = tv_counts = None
+        if self._counters_ready:
+            movie_counts, tv_counts = await gather(self.get_counts("movie"), self.get_counts("tv"))
         for key in self.dbs.keys():
             if key.startswith("storage_"):
                 db = self.dbs[key]
-                movie_count = await db["movie"].count_documents({})
-                tv_count = await db["tv"].count_documents({})
+                shard = int(key.split("_")[1])
+                movie_count = movie_counts.get(shard, 0) if movie_counts is not None else await db["movie"].count_documents({})
+                tv_count = tv_counts.get(shard, 0) if tv_counts is not None else await db["tv"].count_documents({})
                 db_stats = await db.command("dbstats")
                 stats.append({
                     "db_name": key,
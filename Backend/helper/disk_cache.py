@@ -0,0 +1,200 @@
+import asyncio
+import mmap
+import os
+import sqlite3
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import time
+from typing import Dict, Optional, Tuple
+from Backend.config import Telegram
+from Backend.logger import LOGGER
+
+
+SLOT_SIZE = 1024 * 1024
+SLOTS_PER_SEGMENT = 64
+# Read access times are kept in memory and written to the index in batches.
+ACCESS_FLUSH_BATCH = 256
+
+
+class DiskChunkCache:
+    """Persistent chunk tier stored in fixed-size slots of mmap'ed segment files.
+
+    A SQLite index maps (media_id, offset) to a slot and records a CRC of the
+    chunk. Data is written before its index row is committed and verified on
+    read, so a crash can only lose entries, never serve torn chunks.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.total_slots = max_bytes // SLOT_SIZE if directory else 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+        self._lock = Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._segments: Dict[int, Tuple[int, mmap.mmap]] = {}
+        self._index: "OrderedDict[Tuple[int, int], Tuple[int, int, int]]" = OrderedDict()
+        self._free = []
+        self._accessed: Dict[int, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.corrupt = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+
+    async def start(self) -> None:
+        if not self.total_slots:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._open)
+            LOGGER.info(f"Disk chunk cache ready at {self.directory}: {len(self._index)}/{self.total_slots} chunks cached")
+        except Exception as e:
+            LOGGER.error(f"Failed to open disk chunk cache at {self.directory}: {e}")
+            self._db = None
+
+    async def stop(self) -> None:
+        if self.enabled:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+
+    async def get(self, media_id: int, offset: int) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._load, (media_id, offset))
+
+    def store(self, media_id: int, offset: int, data: bytes) -> None:
+        if not self.enabled or not data or len(data) > SLOT_SIZE or offset % SLOT_SIZE:
+            return
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._store, (media_id, offset), data)
+        future.add_done_callback(self._log_store_error)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "max_bytes": self.total_slots * SLOT_SIZE,
+            "chunks": len(self._index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "corrupt": self.corrupt,
+        }
+
+    # -------------------------------
+    # Worker thread methods
+    # -------------------------------
+    def _open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        db = sqlite3.connect(os.path.join(self.directory, "index.db"), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "media_id INTEGER NOT NULL, offset INTEGER NOT NULL, slot INTEGER NOT NULL UNIQUE, "
+            "length INTEGER NOT NULL, crc INTEGER NOT NULL, last_access REAL NOT NULL, "
+            "PRIMARY KEY (media_id, offset))"
+        )
+        # Slots beyond the configured size belong to a larger previous setup.
+        db.execute("DELETE FROM chunks WHERE slot >= ?", (self.total_slots,))
+        db.commit()
+
+        rows = db.execute("SELECT media_id, offset, slot, length, crc FROM chunks ORDER BY last_access").fetchall()
+        for media_id, offset, slot, length, crc in rows:
+            self._index[(media_id, offset)] = (slot, length, crc)
+        used = {slot for slot, _, _ in self._index.values()}
+        self._free = [slot for slot in range(self.total_slots - 1, -1, -1) if slot not in used]
+        self._db = db
+
+    def _close(self) -> None:
+        with self._lock:
+            for fd, mm in self._segments.values():
+                mm.close()
+                os.close(fd)
+            self._segments.clear()
+            if self._db is not None:
+                self._write_access()
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def _segment(self, slot: int) -> Tuple[mmap.mmap, int]:
+        segment_no, position = divmod(slot, SLOTS_PER_SEGMENT)
+        segment = self._segments.get(segment_no)
+        if segment is None:
+            slots = min(SLOTS_PER_SEGMENT, self.total_slots - segment_no * SLOTS_PER_SEGMENT)
+            path = os.path.join(self.directory, f"segment_{segment_no:05d}.bin")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(fd).st_size != slots * SLOT_SIZE:
+                os.ftruncate(fd, slots * SLOT_SIZE)
+            segment = self._segments[segment_no] = (fd, mmap.mmap(fd, slots * SLOT_SIZE))
+        return segment[1], position * SLOT_SIZE
+
+    def _load(self, key: Tuple[int, int]) -> Optional[bytes]:
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or self._db is None:
+                self.misses += 1
+                return None
+            slot, length, crc = entry
+            mm, start = self._segment(slot)
+            data = mm[start:start + length]
+            if zlib.crc32(data) != crc:
+                self.corrupt += 1
+                self.misses += 1
+                del self._index[key]
+                self._free.append(slot)
+                self._accessed.pop(slot, None)
+                self._db.execute("DELETE FROM chunks WHERE slot = ?", (slot,))
+                self._db.commit()
+                return None
+            self._index.move_to_end(key)
+            self._accessed[slot] = time()
+            if len(self._accessed) >= ACCESS_FLUSH_BATCH:
+                self._write_access()
+                self._db.commit()
+            self.hits += 1
+            return data
+
+    def _write_access(self) -> None:
+        """Queue the buffered access times; the caller commits."""
+        if self._accessed:
+            self._db.executemany(
+                "UPDATE chunks SET last_access = ? WHERE slot = ?",
+                [(accessed, slot) for slot, accessed in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def _store(self, key: Tuple[int, int], data: bytes) -> None:
+        with self._lock:
+            if key in self._index or self._db is None:
+                return
+            if self._free:
+                slot = self._free.pop()
+            else:
+                _, (slot, _, _) = self._index.popitem(last=False)
+                self._accessed.pop(slot, None)
+                self._db.execute("DELETE FROM chunks WHERE slot = ?", (slot,))
+                self.evictions += 1
+            mm, start = self._segment(slot)
+            mm[start:start + len(data)] = data
+            crc = zlib.crc32(data)
+            self._db.execute(
+                "INSERT OR REPLACE INTO chunks (media_id, offset, slot, length, crc, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key[0], key[1], slot, len(data), crc, time())
+            )
+            self._write_access()
+            self._db.commit()
+            self._index[key] = (slot, len(data), crc)
+            self.writes += 1
+
+    @staticmethod
+    def _log_store_error(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception():
+            LOGGER.error(f"Failed to write chunk to disk cache: {future.exception()}")
+
+
+disk_cache = DiskChunkCache(Telegram.DISK_CACHE_DIR, Telegram.DISK_CACHE_SIZE * 1024 * 1024)
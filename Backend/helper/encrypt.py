@@ -1,9 +1,48 @@
 import zlib
 import json
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import struct
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from hashlib import blake2b
+from hmac import compare_digest
+from Backend.config import Telegram
+
+# Compact token: version byte, chat_id (u64), msg_id (u32) and a 4-byte
+# tag keyed with a server secret, base64url without padding. Always
+# TOKEN_LENGTH characters, which no legacy zlib+base62 token can be.
+TOKEN_VERSION = 1
+TOKEN_STRUCT = struct.Struct(">BQI")
+TOKEN_TAG_SIZE = 4
+TOKEN_LENGTH = 23
+BASE62_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+_TOKEN_KEY = blake2b((Telegram.TOKEN_SECRET or Telegram.BOT_TOKEN).encode(), digest_size=32).digest()
+
+
+def _token_tag(payload: bytes) -> bytes:
+    return blake2b(payload, digest_size=TOKEN_TAG_SIZE, key=_TOKEN_KEY, person=b"fyvio-token").digest()
+
+
+def pack_token(chat_id: int, msg_id: int) -> str:
+    payload = TOKEN_STRUCT.pack(TOKEN_VERSION, int(chat_id), int(msg_id))
+    return urlsafe_b64encode(payload + _token_tag(payload)).rstrip(b"=").decode()
+
+
+def unpack_token(token: str) -> dict | None:
+    if len(token) != TOKEN_LENGTH:
+        return None
+    try:
+        raw = urlsafe_b64decode(token + "=")
+    except ValueError:
+        return None
+    # Characters outside the alphabet are dropped by the decoder.
+    if len(raw) != TOKEN_STRUCT.size + TOKEN_TAG_SIZE:
+        return None
+    payload, tag = raw[:TOKEN_STRUCT.size], raw[TOKEN_STRUCT.size:]
+    if payload[0] != TOKEN_VERSION or not compare_digest(tag, _token_tag(payload)):
+        return None
+    _, chat_id, msg_id = TOKEN_STRUCT.unpack(payload)
+    return {"chat_id": chat_id, "msg_id": msg_id}
 
-executor = ThreadPoolExecutor()
 
 def compress_data(data):
     return zlib.compress(data.encode(), level=zlib.Z_BEST_COMPRESSION)
@@ -12,7 +51,6 @@ def decompress_data(data):
     return zlib.decompress(data).decode()
 
 def base62_encode(data):
-    BASE62_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
     num = int.from_bytes(data, 'big')
     base62 = []
     while num:
@@ -21,34 +59,20 @@ def base62_encode(data):
     return ''.join(reversed(base62)) or '0'
 
 def base62_decode(data):
-    BASE62_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
     num = 0
     for char in data:
         num = num * 62 + BASE62_ALPHABET.index(char)
     return num.to_bytes((num.bit_length() + 7) // 8, 'big') or b'\0'
 
-async def async_compress_data(data):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(executor, compress_data, data)
-
-async def async_decompress_data(data):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(executor, decompress_data, data)
-
-async def async_base62_encode(data):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(executor, base62_encode, data)
+def legacy_encode(data):
+    return base62_encode(compress_data(json.dumps(data)))
 
-async def async_base62_decode(data):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(executor, base62_decode, data)
+def legacy_decode(encoded_data):
+    return json.loads(decompress_data(base62_decode(encoded_data)))
 
 async def encode_string(data):
-    json_data = json.dumps(data)
-    compressed_data = await async_compress_data(json_data)
-    return await async_base62_encode(compressed_data)
+    return pack_token(data["chat_id"], data["msg_id"])
 
 async def decode_string(encoded_data):
-    compressed_data = await async_base62_decode(encoded_data)
-    json_data = await async_decompress_data(compressed_data)
-    return json.loads(json_data)
+    # Tokens already stored in Mongo use the old JSON+zlib+base62 format.
+    return unpack_token(encoded_data) or legacy_decode(encoded_data)
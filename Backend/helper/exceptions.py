@@ -3,4 +3,12 @@ class InvalidHash(Exception):
 
 
 class FIleNotFound(Exception):
-    message = 'File not found!'
\ No newline at end of file
+    message = 'File not found!'
+
+
+class StreamRejected(Exception):
+    message = 'Too many streams, try again later!'
+
+    def __init__(self, retry_after: int):
+        super().__init__(self.message)
+        self.retry_after = retry_after
@@ -0,0 +1,70 @@
+from typing import Dict, Optional
+from pyrogram import Client
+from pyrogram.file_id import FileId
+from Backend import db
+from Backend.config import Telegram
+from Backend.helper.cache import AsyncTTLCache
+from Backend.helper.exceptions import FIleNotFound
+from Backend.helper.pyro import get_file_ids
+from Backend.logger import LOGGER
+from Backend.pyrofork.bot import StreamBot
+
+
+_file_infos = AsyncTTLCache("file_info", Telegram.FILE_INFO_CACHE_SIZE, Telegram.FILE_ID_CACHE_TTL)
+
+
+def build_file_info(media, bot_id: int) -> Dict:
+    return {
+        "file_ids": {str(bot_id): media.file_id},
+        "unique_id": media.file_unique_id,
+        "dc_id": FileId.decode(media.file_id).dc_id,
+        "file_size": getattr(media, "file_size", 0) or 0,
+        "mime_type": getattr(media, "mime_type", "") or "",
+        "file_name": getattr(media, "file_name", "") or "",
+    }
+
+
+async def get_file_info(chat_id: int, msg_id: int) -> Dict:
+    return await _file_infos.get_or_load((chat_id, msg_id), lambda: _load_file_info(chat_id, msg_id))
+
+
+async def _load_file_info(chat_id: int, msg_id: int) -> Dict:
+    info = await db.get_file_info(chat_id, msg_id)
+    if info is None:
+        # Files ingested before file info was stored: resolve once and backfill.
+        file_id = await get_file_ids(StreamBot, chat_id, msg_id)
+        if not file_id:
+            raise FIleNotFound
+        info = {
+            "file_ids": {str(StreamBot.me.id): file_id.encode()},
+            "unique_id": file_id.unique_id,
+            "dc_id": file_id.dc_id,
+            "file_size": file_id.file_size or 0,
+            "mime_type": file_id.mime_type or "",
+            "file_name": file_id.file_name or "",
+        }
+        await db.save_file_info(chat_id, msg_id, info)
+    return info
+
+
+def decode_file_id(info: Dict, bot_id: int) -> Optional[FileId]:
+    packed = info.get("file_ids", {}).get(str(bot_id))
+    if not packed:
+        return None
+    file_id = FileId.decode(packed)
+    setattr(file_id, 'file_name', info.get("file_name", ""))
+    setattr(file_id, 'file_size', info.get("file_size", 0))
+    setattr(file_id, 'mime_type', info.get("mime_type", ""))
+    setattr(file_id, 'unique_id', info.get("unique_id", ""))
+    return file_id
+
+
+async def store_file_id(chat_id: int, msg_id: int, client: Client, file_id: FileId) -> None:
+    packed = file_id.encode()
+    info = _file_infos.peek((chat_id, msg_id))
+    if info is not None:
+        info.setdefault("file_ids", {})[str(client.me.id)] = packed
+    try:
+        await db.set_file_id(chat_id, msg_id, client.me.id, packed)
+    except Exception as e:
+        LOGGER.error(f"Failed to store file id for {chat_id}/{msg_id}: {e}")
@@ -0,0 +1,272 @@
+import asyncio
+import os
+import shutil
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from aiofiles import open as aiopen
+from aiofiles.os import makedirs as aiomakedirs, rename as aiorename
+from Backend.config import Telegram
+from Backend.helper.chunk_cache import CHUNK_SIZE
+from Backend.logger import LOGGER
+from Backend.pyrofork.bot import work_loads
+
+
+EBML_ID = 0x1A45DFA3
+SEGMENT_ID = 0x18538067
+SEEKHEAD_ID = 0x114D9B74
+SEEK_ID = 0x4DBB
+SEEK_ID_ID = 0x53AB
+SEEK_POSITION_ID = 0x53AC
+CUES_ID = 0x1C53BB6B
+CLUSTER_ID = 0x1F43B675
+
+MAX_INDEX_BYTES = 32 * CHUNK_SIZE
+MAX_MP4_BOXES = 64
+PROBE_SIZE = 4096
+DONE_MARKER = "done"
+
+
+def _read_vint(data: bytes, pos: int, keep_marker: bool) -> Tuple[Optional[int], int]:
+    if pos >= len(data) or not data[pos]:
+        raise ValueError("Invalid EBML variable-size integer")
+    length = 9 - data[pos].bit_length()
+    if pos + length > len(data):
+        raise ValueError("Truncated EBML variable-size integer")
+    value = int.from_bytes(data[pos:pos + length], "big")
+    if not keep_marker:
+        mask = (1 << (7 * length)) - 1
+        value &= mask
+        if value == mask:
+            value = None  # unknown size
+    return value, pos + length
+
+
+def _read_element(data: bytes, pos: int) -> Tuple[int, Optional[int], int]:
+    element_id, pos = _read_vint(data, pos, keep_marker=True)
+    size, pos = _read_vint(data, pos, keep_marker=False)
+    return element_id, size, pos
+
+
+def find_mkv_cues(head: bytes) -> Optional[int]:
+    """Return the absolute offset of the Cues element from a Matroska head."""
+    element_id, size, pos = _read_element(head, 0)
+    if element_id != EBML_ID or size is None:
+        return None
+    element_id, _, pos = _read_element(head, pos + size)
+    if element_id != SEGMENT_ID:
+        return None
+    segment_start = pos
+
+    while pos < len(head):
+        element_id, size, data_start = _read_element(head, pos)
+        if element_id == SEEKHEAD_ID and size is not None:
+            end = min(data_start + size, len(head))
+            seek_pos = data_start
+            while seek_pos < end:
+                seek_id, seek_size, seek_data = _read_element(head, seek_pos)
+                if seek_id == SEEK_ID and seek_size is not None:
+                    target, position = None, None
+                    child = seek_data
+                    while child < min(seek_data + seek_size, end):
+                        child_id, child_size, child_data = _read_element(head, child)
+                        value = head[child_data:child_data + child_size]
+                        if child_id == SEEK_ID_ID:
+                            target = int.from_bytes(value, "big")
+                        elif child_id == SEEK_POSITION_ID:
+                            position = int.from_bytes(value, "big")
+                        child = child_data + child_size
+                    if target == CUES_ID and position is not None:
+                        return segment_start + position
+                if seek_size is None:
+                    break
+                seek_pos = seek_data + seek_size
+        elif element_id == CUES_ID:
+            return pos
+        if element_id == CLUSTER_ID or size is None:
+            break
+        pos = data_start + size
+    return None
+
+
+class HeaderCache:
+    """Persistent store of the container head, tail and index (MKV Cues or
+    MP4 moov) of each file, keyed by file unique id.
+
+    Chunks live in HEADER_CACHE_DIR/<unique_id>/<offset> and are built in the
+    background the first time a file is played. Once the directory holds
+    more than `max_bytes`, the least recently used files are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Set[int]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._building: Dict[str, asyncio.Task] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        self._entries, self._sizes = await loop.run_in_executor(None, self._scan)
+        self.bytes = sum(self._sizes.values())
+        await self._evict()
+        LOGGER.info(f"Header cache ready at {self.directory}: {len(self._entries)} files indexed")
+
+    def _scan(self) -> Tuple["OrderedDict[str, Set[int]]", Dict[str, int]]:
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for unique_id in os.listdir(self.directory):
+            path = os.path.join(self.directory, unique_id)
+            marker = os.path.join(path, DONE_MARKER)
+            if not os.path.isfile(marker):
+                # Left behind by an interrupted build.
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            names = [name for name in os.listdir(path) if name.isdigit()]
+            size = sum(os.path.getsize(os.path.join(path, name)) for name in names)
+            found.append((os.path.getmtime(marker), unique_id, {int(name) for name in names}, size))
+        found.sort()
+        entries = OrderedDict((unique_id, offsets) for _, unique_id, offsets, _ in found)
+        return entries, {unique_id: size for _, unique_id, _, size in found}
+
+    async def _evict(self) -> None:
+        while self.bytes > self.max_bytes and self._entries:
+            unique_id, _ = self._entries.popitem(last=False)
+            self.bytes -= self._sizes.pop(unique_id, 0)
+            self.evictions += 1
+            await asyncio.get_running_loop().run_in_executor(
+                None, shutil.rmtree, os.path.join(self.directory, unique_id), True
+            )
+
+    def has(self, unique_id: str, offset: int) -> bool:
+        return offset in self._entries.get(unique_id, ())
+
+    async def get(self, unique_id: str, offset: int) -> Optional[bytes]:
+        if not self.has(unique_id, offset):
+            return None
+        try:
+            async with aiopen(os.path.join(self.directory, unique_id, str(offset)), "rb") as f:
+                data = await f.read()
+        except OSError:
+            self._entries.get(unique_id, set()).discard(offset)
+            return None
+        if unique_id in self._entries:
+            self._entries.move_to_end(unique_id)
+        self.hits += 1
+        return data
+
+    def schedule(self, streamer, file_id, index: int) -> None:
+        unique_id = file_id.unique_id
+        if not self.enabled or not self.max_bytes or not unique_id or unique_id in self._entries or unique_id in self._building:
+            return
+        task = asyncio.create_task(self._build(streamer, file_id, index))
+        self._building[unique_id] = task
+        task.add_done_callback(lambda _: self._building.pop(unique_id, None))
+
+    async def _build(self, streamer, file_id, index: int) -> None:
+        unique_id, file_size = file_id.unique_id, file_id.file_size
+        work_loads[index] += 1
+        try:
+            head = await streamer.read_part(file_id, 0, CHUNK_SIZE)
+            regions = [(0, min(CHUNK_SIZE, file_size)), (max(file_size - CHUNK_SIZE, 0), min(CHUNK_SIZE, file_size))]
+            index_region = await self._find_index(streamer, file_id, head)
+            if index_region:
+                offset, size = index_region
+                regions.append((offset, min(size, MAX_INDEX_BYTES, file_size - offset)))
+
+            offsets = set()
+            for offset, size in regions:
+                start = offset - offset % CHUNK_SIZE
+                offsets.update(range(start, offset + size, CHUNK_SIZE))
+
+            path = os.path.join(self.directory, unique_id)
+            await aiomakedirs(path, exist_ok=True)
+            size = 0
+            for offset in sorted(offsets):
+                data = head if offset == 0 else await streamer.read_part(file_id, offset, CHUNK_SIZE)
+                if not data:
+                    continue
+                size += len(data)
+                async with aiopen(os.path.join(path, f"{offset}.tmp"), "wb") as f:
+                    await f.write(data)
+                await aiorename(os.path.join(path, f"{offset}.tmp"), os.path.join(path, str(offset)))
+            async with aiopen(os.path.join(path, DONE_MARKER), "w") as f:
+                await f.write(",".join(str(offset) for offset in sorted(offsets)))
+            self._entries[unique_id] = offsets
+            self._sizes[unique_id] = size
+            self.bytes += size
+            await self._evict()
+            LOGGER.info(f"Cached {len(offsets)} header/index chunks for {file_id.file_name or unique_id}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            LOGGER.warning(f"Failed to cache container header for {unique_id}: {e}")
+        finally:
+            work_loads[index] -= 1
+
+    async def _find_index(self, streamer, file_id, head: bytes) -> Optional[Tuple[int, int]]:
+        if head[:4] == EBML_ID.to_bytes(4, "big"):
+            try:
+                cues_offset = find_mkv_cues(head)
+            except ValueError:
+                return None
+            if cues_offset is None or cues_offset >= file_id.file_size:
+                return None
+            probe = await self._probe(streamer, file_id, cues_offset)
+            try:
+                element_id, size, data_start = _read_element(probe, 0)
+            except ValueError:
+                return None
+            if element_id != CUES_ID or size is None:
+                return None
+            return cues_offset, data_start + size
+        if head[4:8] == b"ftyp":
+            return await self._find_moov(streamer, file_id, head)
+        return None
+
+    async def _find_moov(self, streamer, file_id, head: bytes) -> Optional[Tuple[int, int]]:
+        offset = 0
+        for _ in range(MAX_MP4_BOXES):
+            if offset + 16 > file_id.file_size:
+                return None
+            header = head[offset:offset + 16] if offset + 16 <= len(head) else await self._probe(streamer, file_id, offset)
+            size, box_type = int.from_bytes(header[:4], "big"), header[4:8]
+            if size == 1:
+                size = int.from_bytes(header[8:16], "big")
+            elif size == 0:
+                size = file_id.file_size - offset
+            if box_type == b"moov":
+                return offset, size
+            if size < 8:
+                return None
+            offset += size
+        return None
+
+    @staticmethod
+    async def _probe(streamer, file_id, offset: int) -> bytes:
+        base = offset - offset % PROBE_SIZE
+        data = await streamer.read_part(file_id, base, PROBE_SIZE)
+        if offset - base > PROBE_SIZE - 16:
+            data += await streamer.read_part(file_id, base + PROBE_SIZE, PROBE_SIZE)
+        return data[offset - base:]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "files": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "building": len(self._building),
+            "hits": self.hits,
+            "evictions": self.evictions,
+        }
+
+
+header_cache = HeaderCache(Telegram.HEADER_CACHE_DIR, Telegram.HEADER_CACHE_SIZE * 1024 * 1024)
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Dict, Optional, Set, Tuple
+from pyrogram import Client
+from pyrogram.types import Message
+from Backend.logger import LOGGER
+
+
+BATCH_WINDOW = 0.005
+MAX_BATCH = 200  # messages.GetMessages / channels.GetMessages limit
+
+
+class MessageBatcher:
+    """Coalesces get_messages lookups per (client, chat).
+
+    Lookups arriving within BATCH_WINDOW of the first one are sent as a
+    single get_messages call of up to MAX_BATCH ids; a lookup for an id that
+    is already pending or in flight joins it instead of being sent again.
+    """
+
+    def __init__(self, window: float = BATCH_WINDOW, max_batch: int = MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Tuple[Client, int], Dict[int, asyncio.Future]] = {}
+        self._inflight: Dict[Tuple[Client, int, int], asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.lookups = 0
+        self.joins = 0
+        self.calls = 0
+
+    async def get(self, client: Client, chat_id: int, message_id: int) -> Optional[Message]:
+        self.lookups += 1
+        key = (client, chat_id, message_id)
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._inflight[key] = loop.create_future()
+            batch_key = (client, chat_id)
+            batch = self._pending.get(batch_key)
+            if batch is None:
+                batch = self._pending[batch_key] = {}
+                loop.call_later(self.window, self._flush, batch_key, batch)
+            batch[message_id] = future
+            if len(batch) >= self.max_batch:
+                self._flush(batch_key, batch)
+        else:
+            self.joins += 1
+        return await asyncio.shield(future)
+
+    def _flush(self, batch_key: Tuple[Client, int], batch: Dict[int, asyncio.Future]) -> None:
+        if self._pending.get(batch_key) is not batch:
+            return  # Already sent because it filled up.
+        del self._pending[batch_key]
+        task = asyncio.create_task(self._fetch(batch_key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._settle(batch_key, batch))
+
+    async def _fetch(self, batch_key: Tuple[Client, int], batch: Dict[int, asyncio.Future]) -> None:
+        client, chat_id = batch_key
+        self.calls += 1
+        try:
+            messages = await client.get_messages(chat_id, list(batch))
+            found = {message.id: message for message in messages if message is not None}
+            for message_id, future in batch.items():
+                if not future.done():
+                    future.set_result(found.get(message_id))
+        except Exception as e:
+            LOGGER.debug(f"Batched get_messages for {len(batch)} ids in {chat_id} failed: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()  # Waiters may be gone; don't warn about it.
+
+    def _settle(self, batch_key: Tuple[Client, int], batch: Dict[int, asyncio.Future]) -> None:
+        # Runs however the fetch ended, even if it was cancelled before it
+        # started, so no waiter is left on an unresolved future.
+        client, chat_id = batch_key
+        for message_id, future in batch.items():
+            if not future.done():
+                future.cancel()
+            if self._inflight.get((client, chat_id, message_id)) is future:
+                del self._inflight[(client, chat_id, message_id)]
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "joins": self.joins,
+            "calls": self.calls,
+            "pending_batches": len(self._pending),
+            "running_batches": len(self._tasks),
+            "ids_per_call": round((self.lookups - self.joins) / self.calls, 2) if self.calls else 0.0,
+        }
+
+
+message_batcher = MessageBatcher()
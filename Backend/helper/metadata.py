@@ -9,12 +9,25 @@ from Backend.config import Telegram
 import Backend
 from Backend.logger import LOGGER
 from Backend.helper.encrypt import encode_string
+from Backend.helper import metrics
+from time import perf_counter
 
 # ----------------- Configuration -----------------
 DELAY = 2
 tmdb = aioTMDb(key=Telegram.TMDB_API, language="en-US", region="US")
 
 # ----------------- Helpers -----------------
+async def timed(provider: str, operation: str, coro):
+    """Await a provider call and record its latency and outcome."""
+    started = perf_counter()
+    outcome = "error"
+    try:
+        result = await coro
+        outcome = "ok" if result else "empty"
+        return result
+    finally:
+        metrics.metadata_latency.observe(perf_counter() - started, provider, operation, outcome)
+
 def format_tmdb_image(path: str, size="w500") -> str:
     return f"https://image.tmdb.org/t/p/{size}{path}"
 
@@ -28,7 +41,7 @@ def format_imdb_images(imdb_id: str) -> dict:
 async def safe_imdb_search(title: str, type_: str) -> str | None:
     """Safely search IMDb title and return its ID."""
     try:
-        result = await search_title(query=title, type=type_)
+        result = await timed("imdb", "search", search_title(query=title, type=type_))
         return result["id"] if result else None
     except Exception as e:
         LOGGER.warning(f"IMDb search failed for '{title}' [{type_}]: {e}")
@@ -39,11 +52,11 @@ async def safe_tmdb_search(title: str, type_: str, year=None):
     try:
         if type_ == "movie":
             if year:
-                results = await tmdb.search().movies(query=title, year=year)
+                results = await timed("tmdb", "search", tmdb.search().movies(query=title, year=year))
             else:
-                results = await tmdb.search().movies(query=title)
+                results = await timed("tmdb", "search", tmdb.search().movies(query=title))
         else:
-            results = await tmdb.search().tv(query=title)
+            results = await timed("tmdb", "search", tmdb.search().tv(query=title))
         return results[0] if results else None
     except Exception as e:
         LOGGER.error(f"TMDb search failed for '{title}' [{type_}]: {e}")
@@ -126,9 +139,9 @@ async def fetch_tv_metadata(title, season, episode, encoded_string, year=None, q
     if imdb_id:
         try:
             await asyncio.sleep(DELAY)
-            tv_details = await get_detail(imdb_id=imdb_id)
+            tv_details = await timed("imdb", "detail", get_detail(imdb_id=imdb_id))
             await asyncio.sleep(DELAY)
-            ep_details = await get_season(imdb_id=imdb_id, season_id=season, episode_id=episode)
+            ep_details = await timed("imdb", "episode", get_season(imdb_id=imdb_id, season_id=season, episode_id=episode))
         except Exception as e:
             LOGGER.warning(f"IMDb TV fetch failed [{imdb_id}]: {e}")
     
@@ -142,14 +155,14 @@ async def fetch_tv_metadata(title, season, episode, encoded_string, year=None, q
         
         tv_id = tmdb_result.id
         try:
-            tv_details = await tmdb.tv(tv_id).details()
+            tv_details = await timed("tmdb", "detail", tmdb.tv(tv_id).details())
         except Exception as e:
             LOGGER.warning(f"TMDb TV details failed for {title}: {e}")
             return None
         
         # Fetch episode safely
         try:
-            ep_details = await tmdb.episode(tv_id, season, episode).details()
+            ep_details = await timed("tmdb", "episode", tmdb.episode(tv_id, season, episode).details())
         except Exception as e:
             LOGGER.warning(f"TMDb episode not found for {title} S{season}E{episode}: {e}")
             ep_details = None
@@ -212,7 +225,7 @@ async def fetch_movie_metadata(title, encoded_string, year=None, quality=None, d
     # Try IMDb first
     if imdb_id:
         try:
-            movie_details = await get_detail(imdb_id=imdb_id)
+            movie_details = await timed("imdb", "detail", get_detail(imdb_id=imdb_id))
         except Exception as e:
             LOGGER.warning(f"IMDb movie fetch failed [{title}]: {e}")
     
@@ -225,7 +238,7 @@ async def fetch_movie_metadata(title, encoded_string, year=None, quality=None, d
             return None
         
         try:
-            movie_details = await tmdb.movie(tmdb_result.id).details()
+            movie_details = await timed("tmdb", "detail", tmdb.movie(tmdb_result.id).details())
         except Exception as e:
             LOGGER.warning(f"TMDb movie details failed for {title}: {e}")
             return None
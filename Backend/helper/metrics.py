@@ -0,0 +1,166 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Minimal Prometheus text-format (0.0.4) metrics. Label values must come from
+# small fixed sets (bot index, DC, shard, route template...) to keep series
+# cardinality bounded.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DURATION_BUCKETS = LATENCY_BUCKETS + (60, 300, 900, 3600)
+THROUGHPUT_BUCKETS = tuple(2 ** n * 64 * 1024 for n in range(10))  # 64 KiB/s .. 32 MiB/s
+
+registry: List["Metric"] = []
+_lock = Lock()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        registry.append(self)
+
+    def _key(self, labels: Sequence) -> Tuple[str, ...]:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Exposition lines for every labelled series of this metric."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with _lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """Values are read at scrape time from the function given to set_function."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._function: Optional[Callable[[], Dict[Tuple, float]]] = None
+
+    def set_function(self, function: Callable[[], Dict[Tuple, float]]) -> None:
+        """`function` maps label tuples to values."""
+        self._function = function
+
+    def samples(self) -> Iterator[str]:
+        values = {self._key(key): value for key, value in self._function().items()} if self._function else {}
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> Iterator[str]:
+        with _lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {count}"
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+# Streaming
+stream_ttfb = Histogram("fyvio_stream_ttfb_seconds", "Time from stream start to the first body chunk.", ["bot", "dc"])
+stream_throughput = Histogram(
+    "fyvio_stream_throughput_bytes_per_second", "Average throughput of finished streams.", ["bot", "dc"],
+    buckets=THROUGHPUT_BUCKETS,
+)
+stream_bytes = Counter("fyvio_stream_bytes_total", "Body bytes sent to clients, by the bot that served them.", ["bot", "dc"])
+stream_failovers = Counter("fyvio_stream_failovers_total", "Streams moved off a failing bot.", ["bot"])
+stream_rejections = Counter("fyvio_stream_rejections_total", "Streams turned away with 503 by admission control.")
+bot_workload = Gauge("fyvio_bot_workload", "Open streams and background fetches per bot.", ["bot"])
+
+# Telegram
+getfile_latency = Histogram("fyvio_telegram_getfile_seconds", "upload.GetFile latency.", ["bot", "dc"])
+getfile_errors = Counter("fyvio_telegram_getfile_errors_total", "upload.GetFile failures by kind.", ["bot", "dc", "error"])
+media_sessions_created = Counter("fyvio_telegram_media_sessions_created_total", "Media sessions opened.", ["dc"])
+
+# MongoDB
+mongo_latency = Histogram("fyvio_mongo_command_seconds", "MongoDB command latency per shard.", ["shard", "command"])
+mongo_errors = Counter("fyvio_mongo_command_errors_total", "Failed MongoDB commands per shard.", ["shard", "command"])
+
+# HTTP
+http_latency = Histogram(
+    "fyvio_http_request_seconds", "Time until the response starts, by route template.", ["route", "method", "status"]
+)
+http_duration = Histogram(
+    "fyvio_http_response_seconds", "Time until the last body byte is sent, by route template.", ["route", "method", "status"],
+    buckets=DURATION_BUCKETS,
+)
+
+# Ingest
+ingest_queue_depth = Gauge("fyvio_ingest_queue_depth", "Files waiting to be written to the database.")
+metadata_latency = Histogram(
+    "fyvio_metadata_provider_seconds", "Metadata provider request latency.", ["provider", "operation", "outcome"]
+)
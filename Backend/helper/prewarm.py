@@ -0,0 +1,150 @@
+import asyncio
+from time import monotonic
+from typing import Iterable, Set
+from Backend import db
+from Backend.config import Telegram
+from Backend.helper.cache import AsyncTTLCache
+from Backend.helper.chunk_cache import CHUNK_SIZE
+from Backend.helper.custom_dl import get_media_pool, get_streamer, media_pools
+from Backend.helper.encrypt import decode_string
+from Backend.helper.file_info import get_file_info
+from Backend.helper.scheduler import scheduler
+from Backend.logger import LOGGER
+from Backend.pyrofork.bot import multi_clients, work_loads
+
+
+REFRESH_INTERVAL = 5 * 60
+WARM_CONCURRENCY = 2
+MAX_PENDING_WARMS = 32
+
+
+async def _warm_pool(index: int, dc_id: int):
+    started = monotonic()
+    try:
+        await get_media_pool(multi_clients[index], dc_id).warm()
+        return index, dc_id, monotonic() - started, None
+    except Exception as e:
+        return index, dc_id, monotonic() - started, e
+
+
+async def prewarm_media_sessions():
+    try:
+        dc_ids = await db.get_file_dc_ids()
+    except Exception as e:
+        LOGGER.error(f"Could not load file DCs for media session pre-warm: {e}")
+        return
+    if not dc_ids:
+        LOGGER.info("No stored files yet, skipping media session pre-warm")
+        return
+
+    started = monotonic()
+    results = await asyncio.gather(*[
+        _warm_pool(index, dc_id) for index in list(multi_clients) for dc_id in dc_ids
+    ])
+    for index, dc_id, elapsed, error in results:
+        if error:
+            LOGGER.warning(f"Media session pre-warm failed for bot {index} on DC {dc_id} after {elapsed:.2f}s: {error}")
+        else:
+            LOGGER.info(f"Media session ready for bot {index} on DC {dc_id} in {elapsed:.2f}s")
+    ok = sum(1 for *_, error in results if not error)
+    LOGGER.info(f"Pre-warmed {ok}/{len(results)} media sessions in {monotonic() - started:.2f}s")
+
+
+async def refresh_media_sessions():
+    while True:
+        await asyncio.sleep(REFRESH_INTERVAL)
+        for (client, dc_id), pool in list(media_pools.items()):
+            try:
+                dead = await pool.prune()
+                await pool.warm()
+                if dead:
+                    LOGGER.info(f"Replaced {dead} dead media session(s) for {client.name} on DC {dc_id}")
+            except Exception as e:
+                LOGGER.warning(f"Media session refresh failed for {client.name} on DC {dc_id}: {e}")
+
+
+async def warm_stream(chat_id: int, msg_id: int, nbytes: int) -> int:
+    """Resolve a file and pull its first `nbytes` into the chunk cache, so
+    the first request for it starts without a cold Telegram round trip."""
+    info = await get_file_info(chat_id, msg_id)
+    index = scheduler.pick(info["dc_id"])
+    streamer = get_streamer(index)
+    file_id = await streamer.get_file_properties(chat_id, msg_id)
+    await get_media_pool(streamer.client, file_id.dc_id).warm()
+    end = min(nbytes, file_id.file_size)
+    work_loads[index] += 1
+    try:
+        for offset in range(0, end, CHUNK_SIZE):
+            await streamer.read_part(file_id, offset, CHUNK_SIZE)
+    finally:
+        work_loads[index] -= 1
+    return end
+
+
+async def warm_token(token: str, nbytes: int) -> int:
+    decoded = await decode_string(token)
+    return await warm_stream(int(f"-100{decoded['chat_id']}"), int(decoded["msg_id"]), nbytes)
+
+
+class StreamPrewarmer:
+    """Warms the files listed by a Stremio /stream lookup before play is pressed.
+
+    Each token is warmed at most once per `ttl`, at most `per_minute` warm-ups
+    start per minute (token bucket) and at most WARM_CONCURRENCY run at once;
+    anything over budget is skipped rather than queued.
+    """
+
+    def __init__(self, per_minute: int, nbytes: int, ttl: int = 600):
+        self.per_minute = per_minute
+        self.nbytes = nbytes
+        self._seen = AsyncTTLCache("stremio_prewarm", 4096, ttl)
+        self._allowance = float(per_minute)
+        self._refilled = monotonic()
+        self._semaphore = asyncio.Semaphore(WARM_CONCURRENCY)
+        self._tasks: Set[asyncio.Task] = set()
+        self.warmed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def _take(self) -> bool:
+        now = monotonic()
+        self._allowance = min(self.per_minute, self._allowance + (now - self._refilled) * self.per_minute / 60)
+        self._refilled = now
+        if self._allowance < 1 or len(self._tasks) >= MAX_PENDING_WARMS:
+            self.skipped += 1
+            return False
+        self._allowance -= 1
+        return True
+
+    def schedule(self, tokens: Iterable[str]) -> None:
+        if self.per_minute <= 0:
+            return
+        for token in tokens:
+            if token in self._seen or not self._take():
+                continue
+            self._seen.set(token, True)
+            task = asyncio.create_task(self._run(token))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, token: str) -> None:
+        async with self._semaphore:
+            try:
+                await warm_token(token, self.nbytes)
+                self.warmed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                LOGGER.debug(f"Stream pre-warm failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._tasks),
+            "warmed": self.warmed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
+
+
+stream_prewarmer = StreamPrewarmer(Telegram.STREMIO_PREWARM_RATE, Telegram.STREMIO_PREWARM_CHUNKS * CHUNK_SIZE)
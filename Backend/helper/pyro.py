@@ -4,6 +4,7 @@ from Backend.logger import LOGGER
 from Backend import __version__, now, timezone
 from Backend.config import Telegram
 from Backend.helper.exceptions import FIleNotFound
+from Backend.helper.message_batcher import message_batcher
 from aiofiles import open as aiopen
 from aiofiles.os import path as aiopath, remove as aioremove
 from pyrogram import Client
@@ -19,8 +20,8 @@ def is_media(message):
 
 async def get_file_ids(client: Client, chat_id: int, message_id: int) -> Optional[FileId]:
     try:
-        message = await client.get_messages(chat_id, message_id)
-        if message.empty:
+        message = await message_batcher.get(client, chat_id, message_id)
+        if not message or message.empty:
             raise FIleNotFound("Message not found or empty")
         
         if media := is_media(message):
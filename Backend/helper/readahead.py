@@ -0,0 +1,84 @@
+import asyncio
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, Tuple
+from Backend.config import Telegram
+from Backend.helper.chunk_cache import CHUNK_SIZE, chunk_cache
+from Backend.logger import LOGGER
+from Backend.pyrofork.bot import work_loads
+
+
+MAX_VIEWERS = 1024
+VIEWER_TTL = 120
+# A new range counts as a continuation when it starts this close to where the
+# previous one for the same viewer and file stopped.
+SEQUENTIAL_SLACK = 2 * CHUNK_SIZE
+
+
+class Readahead:
+    """Detects sequential playback per (viewer, file) and speculatively pulls
+    the chunks after the current range into the chunk cache, so a player's
+    next chained Range request is served from memory."""
+
+    def __init__(self):
+        self._viewers: "OrderedDict[Tuple[str, int], Dict]" = OrderedDict()
+
+    def observe(self, viewer: str, media_id: int, from_bytes: int) -> bool:
+        now = monotonic()
+        key = (viewer, media_id)
+        state = self._viewers.pop(key, None)
+        sequential = (
+            state is not None
+            and now - state["seen"] < VIEWER_TTL
+            and abs(from_bytes - state["position"]) <= SEQUENTIAL_SLACK
+        )
+        task = state["task"] if state else None
+        if task and not sequential:
+            # The viewer seeked elsewhere; what we were fetching is useless now.
+            task.cancel()
+            task = None
+        self._viewers[key] = {"position": from_bytes, "seen": now, "task": task}
+        while len(self._viewers) > MAX_VIEWERS:
+            _, evicted = self._viewers.popitem(last=False)
+            if evicted["task"]:
+                evicted["task"].cancel()
+        return sequential
+
+    def advance(self, viewer: str, media_id: int, position: int) -> None:
+        state = self._viewers.get((viewer, media_id))
+        if state is not None:
+            state["position"] = position
+            state["seen"] = monotonic()
+
+    def start(self, viewer: str, streamer, file_id, index: int, offset: int) -> None:
+        state = self._viewers.get((viewer, file_id.media_id))
+        if state is None or Telegram.STREAM_READAHEAD <= 0 or not chunk_cache.enabled:
+            return
+        if state["task"] and not state["task"].done():
+            return
+        end = min(file_id.file_size, offset + Telegram.STREAM_READAHEAD * CHUNK_SIZE)
+        if offset >= end:
+            return
+        state["task"] = asyncio.create_task(self._run(streamer, file_id, index, offset, end))
+
+    @staticmethod
+    async def _run(streamer, file_id, index: int, offset: int, end: int) -> None:
+        work_loads[index] += 1
+        try:
+            for chunk_offset in range(offset - offset % CHUNK_SIZE, end, CHUNK_SIZE):
+                await streamer.read_part(file_id, chunk_offset, CHUNK_SIZE)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            LOGGER.debug(f"Readahead stopped for media {file_id.media_id}: {e}")
+        finally:
+            work_loads[index] -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "viewers": len(self._viewers),
+            "active": sum(1 for state in self._viewers.values() if state["task"] and not state["task"].done()),
+        }
+
+
+readahead = Readahead()
@@ -0,0 +1,113 @@
+from time import monotonic
+from typing import Dict, Iterable, List, Tuple
+from Backend.pyrofork.bot import multi_clients, work_loads
+
+
+EWMA_ALPHA = 0.2
+ERROR_HALF_LIFE = 60
+
+
+class BotStats:
+    def __init__(self):
+        self.latency = 0.0
+        self.throughput = 0.0
+        self.samples = 0
+        self.errors = 0.0
+        self.errors_at = monotonic()
+
+    def record(self, nbytes: int, elapsed: float) -> None:
+        elapsed = max(elapsed, 1e-3)
+        if self.samples:
+            self.latency += EWMA_ALPHA * (elapsed - self.latency)
+            self.throughput += EWMA_ALPHA * (nbytes / elapsed - self.throughput)
+        else:
+            self.latency = elapsed
+            self.throughput = nbytes / elapsed
+        self.samples += 1
+
+    def error_score(self) -> float:
+        now = monotonic()
+        self.errors *= 0.5 ** ((now - self.errors_at) / ERROR_HALF_LIFE)
+        self.errors_at = now
+        return self.errors
+
+    def add_error(self) -> None:
+        self.errors = self.error_score() + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "latency_ms": round(self.latency * 1000, 1),
+            "throughput_kbps": round(self.throughput / 1024, 1),
+            "samples": self.samples,
+            "errors": round(self.error_score(), 2),
+        }
+
+
+class BotScheduler:
+    """Routes new streams to the bot with the best expected GetFile throughput.
+
+    Tracks an EWMA of latency and throughput per (bot, DC), a decaying error
+    count and FloodWait cooldowns. Bots without samples for a DC are scored
+    optimistically so they get tried.
+    """
+
+    def __init__(self):
+        self.stats: Dict[Tuple[int, int], BotStats] = {}
+        self.flood_until: Dict[int, float] = {}
+
+    def _stats(self, index: int, dc_id: int) -> BotStats:
+        stats = self.stats.get((index, dc_id))
+        if stats is None:
+            stats = self.stats[(index, dc_id)] = BotStats()
+        return stats
+
+    def record(self, index: int, dc_id: int, nbytes: int, elapsed: float) -> None:
+        self._stats(index, dc_id).record(nbytes, elapsed)
+
+    def record_error(self, index: int, dc_id: int) -> None:
+        self._stats(index, dc_id).add_error()
+
+    def record_flood(self, index: int, seconds: float) -> None:
+        self.flood_until[index] = max(self.flood_until.get(index, 0), monotonic() + seconds)
+
+    def cooling_down(self, index: int) -> bool:
+        return self.flood_until.get(index, 0) > monotonic()
+
+    def expected_throughput(self, index: int, dc_id: int) -> float:
+        known = [s.throughput for (_, dc), s in self.stats.items() if dc == dc_id and s.samples]
+        stats = self.stats.get((index, dc_id))
+        throughput = stats.throughput if stats and stats.samples else max(known, default=1.0)
+        errors = stats.error_score() if stats else 0.0
+        # Open streams share the bot's bandwidth.
+        return throughput / (1 + work_loads.get(index, 0)) / (1 + errors)
+
+    def ranked(self, dc_id: int, exclude: Iterable[int] = ()) -> List[int]:
+        exclude = set(exclude)
+        candidates = [
+            index for index, client in multi_clients.items()
+            if index not in exclude and index in work_loads and client.is_connected
+        ]
+        return sorted(
+            candidates,
+            key=lambda index: (self.cooling_down(index), -self.expected_throughput(index, dc_id), work_loads.get(index, 0))
+        )
+
+    def pick(self, dc_id: int, exclude: Iterable[int] = ()) -> int:
+        ranked = self.ranked(dc_id, exclude)
+        if not ranked:
+            return min(work_loads, key=work_loads.get)
+        return ranked[0]
+
+    def snapshot(self) -> dict:
+        now = monotonic()
+        bots = {}
+        for (index, dc_id), stats in sorted(self.stats.items()):
+            bots.setdefault(f"bot{index + 1}", {})[f"dc{dc_id}"] = stats.to_dict()
+        for index in sorted(work_loads):
+            bot = bots.setdefault(f"bot{index + 1}", {})
+            bot["load"] = work_loads[index]
+            bot["flood_wait"] = max(0, round(self.flood_until.get(index, 0) - now, 1))
+        return bots
+
+
+scheduler = BotScheduler()
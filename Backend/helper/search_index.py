@@ -0,0 +1,246 @@
+import heapq
+import re
+from math import isfinite
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+# Fields returned for a hit; the same projection the regex search used.
+RESULT_FIELDS = (
+    "_id", "tmdb_id", "title", "genres", "rating", "imdb_id", "release_year",
+    "poster", "backdrop", "description", "logo", "media_type", "db_index",
+)
+
+TITLE, FILE_NAME = 2, 1
+EXACT, PREFIX, SUBSTRING = 3, 2, 1
+YEAR_MATCH = 2
+PREFIX_LENGTHS = (1, 2)
+
+_WORD = re.compile(r"[^\W_]+")
+
+Key = Tuple[str, str]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased, accent-stripped alphanumeric words of `text`."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return _WORD.findall(text)
+
+
+def _number(value: Any) -> Optional[float]:
+    """`value` as a float, or None when it is missing or not numeric."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if isfinite(number) else None
+
+
+def _trigrams(token: str) -> Set[str]:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+def file_names(collection_name: str, document: Dict[str, Any]) -> Iterable[str]:
+    if collection_name == "movie":
+        qualities = document.get("telegram") or []
+    else:
+        qualities = [
+            quality
+            for season in document.get("seasons") or []
+            for episode in season.get("episodes") or []
+            for quality in episode.get("telegram") or []
+        ]
+    return [quality["name"] for quality in qualities if quality.get("name")]
+
+
+class SearchIndex:
+    """In-memory inverted index over the titles and file names of every shard.
+
+    Each token has postings of the documents containing it (with the best
+    field weight, title over file name). Query words match tokens exactly,
+    by prefix (1-2 letter words, through prefix postings) or as a substring
+    (through trigram postings over the vocabulary), so results match what
+    the unanchored regex search found, but ranked. Every word must match; a
+    four-digit word also matches the release year facet.
+    """
+
+    def __init__(self):
+        self._reset()
+        self.ready = False
+        self.queries = 0
+
+    def _reset(self) -> None:
+        self._docs: Dict[Key, Dict[str, Any]] = {}
+        self._doc_tokens: Dict[Key, Dict[str, int]] = {}
+        self._titles: Dict[Key, str] = {}
+        self._postings: Dict[str, Dict[Key, int]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._prefixes: Dict[str, Set[str]] = {}
+        self._by_type: Dict[str, Set[Key]] = {}
+        self._by_year: Dict[int, Set[Key]] = {}
+        self._ratings: Dict[Key, float] = {}
+        self._years: Dict[Key, int] = {}
+        self._touched: Optional[Set[Key]] = None
+
+    # -------------------------------
+    # Writes
+    # -------------------------------
+    def add(self, collection_name: str, document: Dict[str, Any]) -> None:
+        key = (collection_name, str(document["_id"]))
+        if self._touched is not None:
+            self._touched.add(key)
+        self._put(key, collection_name, document)
+
+    def remove(self, collection_name: str, document_id: Any) -> None:
+        key = (collection_name, str(document_id))
+        if self._touched is not None:
+            self._touched.add(key)
+        self._drop(key)
+
+    def begin_build(self) -> None:
+        """Start a full (re)load; writes from here on win over loaded documents."""
+        self._touched = set()
+
+    def load(self, collection_name: str, document: Dict[str, Any]) -> None:
+        key = (collection_name, str(document["_id"]))
+        if key not in self._touched:
+            self._put(key, collection_name, document)
+
+    def abort_build(self) -> None:
+        """Drop everything loaded so far; the next build starts from scratch."""
+        self._reset()
+        self.ready = False
+
+    def finish_build(self) -> None:
+        self._touched = None
+        self.ready = True
+
+    def _put(self, key: Key, collection_name: str, document: Dict[str, Any]) -> None:
+        self._drop(key)
+        tokens: Dict[str, int] = {}
+        for name in file_names(collection_name, document):
+            for token in tokenize(name):
+                tokens[token] = FILE_NAME
+        title_tokens = tokenize(document.get("title") or "")
+        for token in title_tokens:
+            tokens[token] = TITLE
+
+        summary = {field: document[field] for field in RESULT_FIELDS if field in document}
+        summary["_id"] = key[1]
+        self._docs[key] = summary
+        self._doc_tokens[key] = tokens
+        self._titles[key] = " ".join(title_tokens)
+        for token, field in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                for gram in _trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+                for length in PREFIX_LENGTHS:
+                    self._prefixes.setdefault(token[:length], set()).add(token)
+            postings[key] = field
+        self._by_type.setdefault(collection_name, set()).add(key)
+        self._ratings[key] = _number(document.get("rating")) or 0.0
+        year = _number(document.get("release_year"))
+        if year:
+            self._years[key] = int(year)
+            self._by_year.setdefault(int(year), set()).add(key)
+
+    def _drop(self, key: Key) -> None:
+        if self._docs.pop(key, None) is None:
+            return
+        for token in self._doc_tokens.pop(key):
+            postings = self._postings[token]
+            del postings[key]
+            if not postings:
+                del self._postings[token]
+                for gram in _trigrams(token):
+                    self._trigrams[gram].discard(token)
+                    if not self._trigrams[gram]:
+                        del self._trigrams[gram]
+                for length in PREFIX_LENGTHS:
+                    self._prefixes[token[:length]].discard(token)
+                    if not self._prefixes[token[:length]]:
+                        del self._prefixes[token[:length]]
+        del self._titles[key]
+        del self._ratings[key]
+        self._by_type[key[0]].discard(key)
+        year = self._years.pop(key, None)
+        if year:
+            self._by_year[year].discard(key)
+            if not self._by_year[year]:
+                del self._by_year[year]
+
+    # -------------------------------
+    # Queries
+    # -------------------------------
+    def _matching_tokens(self, word: str) -> Dict[str, int]:
+        tokens = {word: EXACT} if word in self._postings else {}
+        if len(word) <= max(PREFIX_LENGTHS):
+            candidates = self._prefixes.get(word, ())
+        else:
+            grams = sorted((self._trigrams.get(gram, set()) for gram in _trigrams(word)), key=len)
+            candidates = set(grams[0]).intersection(*grams[1:]) if grams else ()
+        for token in candidates:
+            if token != word and word in token:
+                tokens[token] = PREFIX if token.startswith(word) else SUBSTRING
+        return tokens
+
+    def _match(self, word: str) -> Dict[Key, int]:
+        scores: Dict[Key, int] = {}
+        for token, kind in self._matching_tokens(word).items():
+            for key, field in self._postings[token].items():
+                score = kind * field
+                if score > scores.get(key, 0):
+                    scores[key] = score
+        if len(word) == 4 and word.isdigit():
+            for key in self._by_year.get(int(word), ()):
+                scores[key] = max(scores.get(key, 0), YEAR_MATCH)
+        return scores
+
+    def search(
+        self, query: str, media_type: Optional[str] = None, offset: int = 0, limit: Optional[int] = None
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Ranked hits for `query` as (total, page of result documents)."""
+        self.queries += 1
+        words = tokenize(query)
+        if not words:
+            return 0, []
+        scores: Optional[Dict[Key, int]] = None
+        for word in dict.fromkeys(words):
+            matches = self._match(word)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {key: score + matches[key] for key, score in scores.items() if key in matches}
+            if not scores:
+                return 0, []
+        if media_type:
+            allowed = self._by_type.get(media_type, set())
+            scores = {key: score for key, score in scores.items() if key in allowed}
+
+        phrase = " ".join(words)
+
+        def rank(key: Key):
+            title = self._titles[key]
+            bonus = 10 if title == phrase else 5 if title.startswith(phrase) else 0
+            return (-(scores[key] + bonus), -self._ratings[key], title)
+
+        if limit is None:
+            ranked = sorted(scores, key=rank)[offset:]
+        else:
+            ranked = heapq.nsmallest(offset + limit, scores, key=rank)[offset:]
+        return len(scores), [dict(self._docs[key]) for key in ranked]
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "documents": len(self._docs),
+            "tokens": len(self._postings),
+            "trigrams": len(self._trigrams),
+            "queries": self.queries,
+        }
+
+
+search_index = SearchIndex()
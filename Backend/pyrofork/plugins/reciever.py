@@ -6,6 +6,8 @@ from Backend import db
 from Backend.config import Telegram
 from Backend.helper.pyro import clean_filename, get_readable_file_size, remove_urls
 from Backend.helper.metadata import metadata
+from Backend.helper.file_info import build_file_info
+from Backend.helper import metrics
 from pyrogram import filters, Client
 from pyrogram.types import Message
 from pyrogram.errors import FloodWait
@@ -14,6 +16,7 @@ from pyrogram.enums.parse_mode import ParseMode
 
 file_queue = Queue()
 db_lock = Lock()
+metrics.ingest_queue_depth.set_function(lambda: {(): file_queue.qsize()})
 
 async def process_file():
     while True:
@@ -46,6 +49,11 @@ async def file_receive_handler(client: Client, message: Message):
                     LOGGER.warning(f"Metadata failed for file: {title} (ID: {msg_id})")
                     return
 
+                try:
+                    await db.save_file_info(message.chat.id, msg_id, build_file_info(file, client.me.id))
+                except Exception as e:
+                    LOGGER.error(f"Failed to store file info for {msg_id}: {e}")
+
                 title = remove_urls(title)
                 if not title.endswith(('.mkv', '.mp4')):
                     title += '.mkv'
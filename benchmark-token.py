@@ -0,0 +1,32 @@
+import sys
+import timeit
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+
+# Load encrypt.py on its own so the benchmark needs no config or database.
+spec = spec_from_file_location("encrypt", Path(__file__).parent / "Backend" / "helper" / "encrypt.py")
+encrypt = module_from_spec(spec)
+spec.loader.exec_module(encrypt)
+legacy_decode, legacy_encode = encrypt.legacy_decode, encrypt.legacy_encode
+pack_token, unpack_token = encrypt.pack_token, encrypt.unpack_token
+
+def bench(label: str, func, number: int):
+    seconds = timeit.timeit(func, number=number)
+    print(f"{label:<16} {seconds / number * 1e6:8.2f} us/op")
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data = {"chat_id": 2012345678, "msg_id": 123456}
+    legacy = legacy_encode(data)
+    compact = pack_token(data["chat_id"], data["msg_id"])
+    assert legacy_decode(legacy) == data and unpack_token(compact) == data
+
+    print(f"legacy token:  {legacy} ({len(legacy)} chars)")
+    print(f"compact token: {compact} ({len(compact)} chars)")
+    bench("legacy encode", lambda: legacy_encode(data), number)
+    bench("legacy decode", lambda: legacy_decode(legacy), number)
+    bench("compact encode", lambda: pack_token(data["chat_id"], data["msg_id"]), number)
+    bench("compact decode", lambda: unpack_token(compact), number)
+
+if __name__ == "__main__":
+    main()
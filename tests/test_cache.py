@@ -0,0 +1,52 @@
+import asyncio
+
+from Backend.helper.cache import AsyncTTLCache
+
+
+def test_failed_loads_are_not_cached():
+    async def scenario():
+        cache = AsyncTTLCache("test_failed", 4, ttl=60)
+
+        async def broken():
+            raise ValueError("boom")
+
+        async def loader():
+            return "value"
+
+        try:
+            await cache.get_or_load("key", broken)
+        except ValueError:
+            pass
+        assert "key" not in cache
+        assert await cache.get_or_load("key", loader) == "value"
+        assert cache.get("key") == "value"
+
+    asyncio.run(scenario())
+
+
+def test_load_after_last_waiter_left_is_not_cancelled():
+    async def scenario():
+        cache = AsyncTTLCache("test_cancel", 4, ttl=60)
+        blocked = asyncio.Event()
+
+        async def stalled():
+            await blocked.wait()
+            return "stale"
+
+        async def loader():
+            return "fresh"
+
+        waiter = asyncio.create_task(cache.get_or_load("key", stalled))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+
+        assert await cache.get_or_load("key", loader) == "fresh"
+        await asyncio.sleep(0)
+        assert cache.get("key") == "fresh"
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,50 @@
+import asyncio
+
+from Backend.helper.chunk_cache import ChunkCache
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def scenario():
+        cache = ChunkCache(1024)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0)
+            return b"data"
+
+        results = await asyncio.gather(*(cache.get_or_fetch((1, 0), fetch) for _ in range(3)))
+        assert results == [b"data"] * 3
+        assert len(calls) == 1
+        assert cache.get((1, 0)) == b"data"
+
+    asyncio.run(scenario())
+
+
+def test_request_after_last_waiter_left_starts_a_new_fetch():
+    async def scenario():
+        cache = ChunkCache(1024)
+        blocked = asyncio.Event()
+
+        async def stalled():
+            await blocked.wait()
+            return b"stale"
+
+        async def fetch():
+            return b"fresh"
+
+        waiter = asyncio.create_task(cache.get_or_fetch((1, 0), stalled))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+
+        # The abandoned fetch may not have finished cancelling yet.
+        assert await cache.get_or_fetch((1, 0), fetch) == b"fresh"
+        await asyncio.sleep(0)
+        assert cache.get((1, 0)) == b"fresh"
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import pytest
+from pymongo import ASCENDING, DESCENDING
+
+from Backend.helper.database import _after_position, _merge_key, _position
+
+
+def _bson_type(value):
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, datetime):
+        return "date"
+    return None
+
+
+def _matches(doc, query):
+    """Evaluate the subset of Mongo filters the keyset helpers emit."""
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        value = doc.get(key)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for op, arg in condition.items():
+            # Comparisons only match values of the same BSON type.
+            comparable = value is not None and _bson_type(value) == _bson_type(arg)
+            if op == "$lt" and not (comparable and value < arg):
+                return False
+            if op == "$gt" and not (comparable and value > arg):
+                return False
+            if op == "$type" and _bson_type(value) not in arg:
+                return False
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$exists" and (key in doc) != arg:
+                return False
+    return True
+
+
+# (shard, doc): ties on the sort value across shards, nulls and a missing field.
+SHARDS = {
+    1: [{"_id": 1, "rating": 7.5}, {"_id": 2, "rating": None}, {"_id": 3, "rating": 9.0}, {"_id": 4}],
+    2: [{"_id": 1, "rating": 7.5}, {"_id": 5, "rating": 7.5}, {"_id": 6, "rating": None}],
+    3: [{"_id": 2, "rating": 9.0}, {"_id": 7, "rating": 1.0}, {"_id": 8}],
+}
+
+
+# Ratings stored through the edit API can be strings, mixed with numbers.
+MIXED_SHARDS = {
+    1: [{"_id": 1, "rating": ""}, {"_id": 2, "rating": 7.5}, {"_id": 3, "rating": "8"}],
+    2: [{"_id": 1, "rating": 9}, {"_id": 2}, {"_id": 3, "rating": ""}, {"_id": 4, "rating": True}],
+    3: [{"_id": 1, "rating": datetime(2020, 1, 1)}, {"_id": 2, "rating": 7.5}],
+}
+
+
+def _global_order(shards, direction):
+    docs = [(db_index, doc) for db_index, shard in shards.items() for doc in shard]
+    return sorted(docs, key=lambda item: _merge_key(item[1], "rating", item[0]), reverse=direction == DESCENDING)
+
+
+def test_merge_key_orders_nulls_first():
+    assert _merge_key({"_id": 1}, "rating", 1) < _merge_key({"_id": 1, "rating": -100}, "rating", 1)
+    assert _merge_key({"_id": 1, "rating": None}, "rating", 1) == _merge_key({"_id": 1}, "rating", 1)
+
+
+def test_merge_key_breaks_ties_by_shard_then_id():
+    first = _merge_key({"_id": 9, "rating": 5}, "rating", 1)
+    second = _merge_key({"_id": 1, "rating": 5}, "rating", 2)
+    third = _merge_key({"_id": 2, "rating": 5}, "rating", 2)
+    assert first < second < third
+
+
+def test_merge_key_orders_types_like_mongo():
+    order = [(db_index, doc["_id"]) for db_index, doc in _global_order(MIXED_SHARDS, ASCENDING)]
+    assert order == [(2, 2), (1, 2), (3, 2), (2, 1), (1, 1), (2, 3), (1, 3), (2, 4), (3, 1)]
+
+
+@pytest.mark.parametrize("shards", [SHARDS, MIXED_SHARDS])
+@pytest.mark.parametrize("direction", [ASCENDING, DESCENDING])
+def test_after_position_resumes_global_order(shards, direction):
+    order = _global_order(shards, direction)
+    for index, (last_shard, last_doc) in enumerate(order):
+        position = _position("rating", direction, last_shard, last_doc)
+        rest = [
+            (db_index, doc)
+            for db_index, shard in shards.items()
+            for doc in shard
+            if _matches(doc, _after_position("rating", direction, position, db_index))
+        ]
+        expected = order[index + 1:]
+        assert sorted(rest, key=lambda item: (item[0], item[1]["_id"])) == \
+            sorted(expected, key=lambda item: (item[0], item[1]["_id"]))
+
+
+def test_after_last_null_ascending_skips_remaining_nulls_on_earlier_shards():
+    position = {"v": None, "s": 2, "i": 6}
+    assert not _matches({"_id": 2, "rating": None}, _after_position("rating", ASCENDING, position, 1))
+    assert _matches({"_id": 8}, _after_position("rating", ASCENDING, position, 3))
+    assert _matches({"_id": 1, "rating": 0.5}, _after_position("rating", ASCENDING, position, 1))
+
+
+def test_after_lowest_value_descending_continues_with_nulls():
+    position = {"v": 1.0, "s": 3, "i": 7}
+    assert _matches({"_id": 4}, _after_position("rating", DESCENDING, position, 1))
+    assert _matches({"_id": 6, "rating": None}, _after_position("rating", DESCENDING, position, 2))
+    assert not _matches({"_id": 1, "rating": 7.5}, _after_position("rating", DESCENDING, position, 1))
@@ -0,0 +1,39 @@
+import asyncio
+from base64 import urlsafe_b64encode
+from hashlib import blake2b
+
+from Backend.helper.encrypt import (
+    TOKEN_LENGTH, TOKEN_STRUCT, TOKEN_TAG_SIZE, TOKEN_VERSION,
+    decode_string, encode_string, legacy_encode, pack_token, unpack_token,
+)
+
+
+def test_compact_token_round_trip():
+    token = asyncio.run(encode_string({"chat_id": 1234567890123, "msg_id": 4242}))
+    assert len(token) == TOKEN_LENGTH
+    assert asyncio.run(decode_string(token)) == {"chat_id": 1234567890123, "msg_id": 4242}
+
+
+def test_tampered_token_is_rejected():
+    token = pack_token(100, 7)
+    tampered = token[:-1] + ("A" if token[-1] != "A" else "B")
+    assert unpack_token(tampered) is None
+
+
+def test_unkeyed_tag_is_rejected():
+    payload = TOKEN_STRUCT.pack(TOKEN_VERSION, 100, 8)
+    tag = blake2b(payload, digest_size=TOKEN_TAG_SIZE, person=b"fyvio-token").digest()
+    forged = urlsafe_b64encode(payload + tag).rstrip(b"=").decode()
+    assert len(forged) == TOKEN_LENGTH
+    assert unpack_token(forged) is None
+
+
+def test_malformed_token_of_token_length_is_rejected():
+    assert unpack_token("!" * TOKEN_LENGTH) is None
+    assert unpack_token("AAAA" + "." * (TOKEN_LENGTH - 4)) is None
+
+
+def test_legacy_token_still_decodes():
+    legacy = legacy_encode({"chat_id": 1234567890, "msg_id": 55})
+    assert len(legacy) != TOKEN_LENGTH
+    assert asyncio.run(decode_string(legacy)) == {"chat_id": 1234567890, "msg_id": 55}
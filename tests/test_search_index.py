@@ -0,0 +1,83 @@
+from Backend.helper.search_index import SearchIndex, tokenize
+
+
+def _movie(doc_id, title, **fields):
+    return {"_id": doc_id, "title": title, "media_type": "movie", **fields}
+
+
+def _ids(results):
+    return [doc["_id"] for doc in results]
+
+
+def test_tokenize_folds_case_and_accents():
+    assert tokenize("Amélie: Le Fabuleux_Destin (2001)") == ["amelie", "le", "fabuleux", "destin", "2001"]
+
+
+def test_exact_prefix_and_substring_matches():
+    index = SearchIndex()
+    index.add("movie", _movie(1, "Interstellar"))
+    index.add("movie", _movie(2, "The Interstellar Ark"))
+    index.add("movie", _movie(3, "Stella"))
+
+    assert _ids(index.search("interstellar")[1]) == ["1", "2"]
+    assert index.search("st")[0] == 1
+    assert sorted(_ids(index.search("stell")[1])) == ["1", "2", "3"]
+    assert _ids(index.search("stell")[1])[0] == "3"
+    assert index.search("xyz") == (0, [])
+
+
+def test_every_word_must_match():
+    index = SearchIndex()
+    index.add("movie", _movie(1, "Dark Knight"))
+    index.add("movie", _movie(2, "Dark City"))
+
+    assert _ids(index.search("dark kni")[1]) == ["1"]
+
+
+def test_file_names_and_media_type_filter():
+    index = SearchIndex()
+    index.add("movie", _movie(1, "Heat", telegram=[{"name": "Heat.1995.REMASTERED.mkv"}]))
+    index.add("tv", {
+        "_id": 2, "title": "Heat Wave", "media_type": "tv",
+        "seasons": [{"episodes": [{"telegram": [{"name": "Heat.Wave.S01E01.mkv"}]}]}],
+    })
+
+    assert _ids(index.search("remastered")[1]) == ["1"]
+    assert _ids(index.search("heat", media_type="tv")[1]) == ["2"]
+
+
+def test_string_and_missing_ratings_and_years_are_coerced():
+    index = SearchIndex()
+    index.add("movie", _movie(1, "Alien", rating="8.5", release_year="1979"))
+    index.add("movie", _movie(2, "Aliens", rating=None, release_year="unknown"))
+    index.add("movie", _movie(3, "Alien Nation", rating="n/a"))
+    index.add("movie", _movie(4, "Alien Covenant", rating=6.4, release_year=2017))
+
+    total, results = index.search("alien")
+    assert total == 4
+    assert _ids(results)[0] == "1"
+    assert _ids(index.search("alien 1979")[1]) == ["1"]
+    assert _ids(index.search("alien 2017")[1]) == ["4"]
+
+
+def test_remove_cleans_up_postings():
+    index = SearchIndex()
+    index.add("movie", _movie(1, "Solaris", release_year=1972))
+    index.remove("movie", 1)
+
+    assert index.search("sol") == (0, [])
+    assert index.search("1972") == (0, [])
+    assert index.stats()["tokens"] == 0
+    assert index.stats()["trigrams"] == 0
+
+
+def test_writes_during_a_build_win_over_loaded_documents():
+    index = SearchIndex()
+    index.begin_build()
+    index.add("movie", _movie(1, "Renamed"))
+    index.load("movie", _movie(1, "Stale"))
+    index.finish_build()
+
+    assert index.ready
+    assert index.search("stale") == (0, [])
+    assert _ids(index.search("renamed")[1]) == ["1"]